@@ -0,0 +1,107 @@
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+_missing = object()
+
+
+class InstrumentedTemplate:
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def render(self, context=None, request=None):
+        # include и extends рендерятся внутри, так что время не двоится
+        with metrics.timer('templates'):
+            return self.wrapped.render(context, request)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """DjangoTemplates, который засекает время рендеринга страниц."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+    def template_names(self):
+        """Имена всех файлов во всех каталогах шаблонов."""
+        names = set()
+        loaders = []
+        for loader in self.engine.template_loaders:
+            # Кэширующий загрузчик сам каталогов не знает
+            loaders.extend(getattr(loader, 'loaders', [loader]))
+        for loader in loaders:
+            for directory in loader.get_dirs():
+                for root, _, files in os.walk(directory):
+                    for file in files:
+                        names.add(os.path.relpath(
+                            os.path.join(root, file), directory))
+        return sorted(name.replace(os.sep, '/') for name in names)
+
+    def precompile(self):
+        """Разбирает все шаблоны, прогревая кэширующий загрузчик.
+
+        Возвращает число шаблонов и список (имя, ошибка) для тех, что
+        не разбираются.
+        """
+        names = self.template_names()
+        errors = []
+        for name in names:
+            try:
+                self.engine.get_template(name)
+            except TemplateSyntaxError as error:
+                errors.append((name, error))
+        return len(names), errors
+
+
+def precompile_templates():
+    """precompile() всех движков шаблонов, которые его поддерживают."""
+    total, errors = 0, []
+    for engine in engines.all():
+        if isinstance(engine, InstrumentedTemplates):
+            count, engine_errors = engine.precompile()
+            total += count
+            errors.extend(engine_errors)
+    return total, errors
+
+
+class InstrumentedCache:
+    """Обёртка над настоящим бэкендом кэша, считающая попадания.
+
+    Настоящий бэкенд задаётся ключом WRAPPED_BACKEND в CACHES, остальные
+    параметры передаются ему как есть.
+    """
+
+    def __init__(self, location, params):
+        params = dict(params)
+        backend = import_string(params.pop('WRAPPED_BACKEND'))
+        self.cache = backend(location, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, _missing, version=version)
+        if value is _missing:
+            metrics.count('cache_misses')
+            return default
+        metrics.count('cache_hits')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.cache.get_many(keys, version=version)
+        metrics.count('cache_hits', len(found))
+        metrics.count('cache_misses', len(keys) - len(found))
+        return found
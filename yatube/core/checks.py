@@ -0,0 +1,57 @@
+import logging
+
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger('yatube.performance')
+
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                'django.core.cache.backends.dummy.DummyCache')
+
+
+def uses_cached_loader(template):
+    return any(
+        isinstance(loader, (list, tuple)) and loader[0].endswith(
+            'cached.Loader')
+        for loader in template.get('OPTIONS', {}).get('loaders', []))
+
+
+@checks.register('performance', deploy=True)
+def performance_settings(app_configs, **kwargs):
+    """Настройки, которые под нагрузкой тратят память и процессор."""
+    warnings = []
+    if settings.DEBUG:
+        warnings.append(checks.Warning(
+            'DEBUG включён: каждый SQL-запрос копится в connection.queries.',
+            hint='Запускайте с YATUBE_ENV=prod.', id='yatube.W001'))
+    if not all(uses_cached_loader(template)
+               for template in settings.TEMPLATES):
+        warnings.append(checks.Warning(
+            'Шаблоны разбираются заново на каждый запрос.',
+            hint='Оберните загрузчики в django.template.loaders.cached.'
+                 'Loader.', id='yatube.W002'))
+    for alias, database in settings.DATABASES.items():
+        if 'sqlite3' not in database['ENGINE'] and not database.get(
+                'CONN_MAX_AGE'):
+            warnings.append(checks.Warning(
+                f'База {alias} открывает соединение на каждый запрос.',
+                hint='Задайте YATUBE_DB_CONN_MAX_AGE.', id='yatube.W003'))
+    if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.db':
+        warnings.append(checks.Warning(
+            'Сессия читается из базы на каждый запрос.',
+            hint='Используйте signed_cookies или cached_db.',
+            id='yatube.W004'))
+    cache = settings.CACHES['default']
+    if cache.get('WRAPPED_BACKEND', cache['BACKEND']) in LOCAL_CACHES:
+        warnings.append(checks.Warning(
+            'Кэш локален для процесса: воркеры не видят сбросов друг друга.',
+            hint='Задайте YATUBE_CACHE=memcached, db или file.',
+            id='yatube.W005'))
+    return warnings
+
+
+def warn_on_startup():
+    """Пишет предупреждения проверки в лог yatube.performance."""
+    for message in checks.run_checks(
+            tags=['performance'], include_deployment_checks=True):
+        logger.warning('%s', message)
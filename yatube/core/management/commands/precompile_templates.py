@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backends import precompile_templates
+
+
+class Command(BaseCommand):
+    help = ('Разбирает все шаблоны и завершается ошибкой, если какой-то '
+            'из них не разбирается')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total, errors = precompile_templates()
+        if errors:
+            raise CommandError('Ошибки в шаблонах:\n' + '\n'.join(
+                f'{name}: {error}' for name, error in errors))
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Шаблонов: {total} за '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс'))
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Границы гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Что потратил один запрос: SQL, шаблоны, кэш и картинки."""
+
+    def __init__(self, max_queries):
+        self.started = time.perf_counter()
+        self.max_queries = max_queries
+        self.queries = []
+        self.query_count = 0
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def add_query(self, sql, duration):
+        self.query_count += 1
+        self.timings['db'] += duration
+        # Для лога медленных запросов хватит первых max_queries
+        if len(self.queries) < self.max_queries:
+            self.queries.append((sql, duration))
+
+
+def current():
+    """Метрики обрабатываемого запроса или None вне запроса."""
+    return _current.get()
+
+
+def start(max_queries):
+    metrics = RequestMetrics(max_queries)
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def count(name, value=1):
+    metrics = current()
+    if metrics is not None:
+        metrics.counters[name] += value
+
+
+@contextmanager
+def timer(name):
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.timings[name] += time.perf_counter() - started
+
+
+class Registry:
+    """Накопленные метрики процесса по именам представлений."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+            self.sums = defaultdict(float)
+            self.counters = defaultdict(int)
+
+    def observe(self, view, metrics, duration):
+        with self.lock:
+            self.requests[view] += 1
+            self.sums[('request_seconds', view)] += duration
+            buckets = self.buckets[view]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+            self.counters[('sql_queries', view)] += metrics.query_count
+            for name, value in metrics.timings.items():
+                self.sums[(f'{name}_seconds', view)] += value
+            for name, value in metrics.counters.items():
+                self.counters[(name, view)] += value
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus.
+
+        Каждое семейство метрик выводится одним блоком со строкой # TYPE.
+        """
+        lines = ['# TYPE yatube_request_seconds histogram']
+        families = defaultdict(list)
+        with self.lock:
+            for view, total in sorted(self.requests.items()):
+                label = f'view="{view}"'
+                for bound, value in zip(DURATION_BUCKETS, self.buckets[view]):
+                    lines.append(f'yatube_request_seconds_bucket'
+                                 f'{{{label},le="{bound}"}} {value}')
+                lines.append(f'yatube_request_seconds_bucket'
+                             f'{{{label},le="+Inf"}} {total}')
+                duration = self.sums.get(('request_seconds', view), 0)
+                lines.append(f'yatube_request_seconds_sum'
+                             f'{{{label}}} {duration:.6f}')
+                lines.append(f'yatube_request_seconds_count'
+                             f'{{{label}}} {total}')
+            for (name, view), value in self.sums.items():
+                if name != 'request_seconds':
+                    families[name].append((view, f'{value:.6f}'))
+            for (name, view), value in self.counters.items():
+                families[name].append((view, value))
+        for name, samples in sorted(families.items()):
+            lines.append(f'# TYPE yatube_{name}_total counter')
+            for view, value in sorted(samples):
+                lines.append(f'yatube_{name}_total{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
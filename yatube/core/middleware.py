@@ -0,0 +1,81 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('yatube.performance')
+
+
+def record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            request_metrics.add_query(sql, time.perf_counter() - started)
+
+
+def server_timing(request_metrics, duration):
+    """Значение заголовка Server-Timing, длительности в миллисекундах."""
+    parts = [f'db;dur={request_metrics.timings["db"] * 1000:.1f};'
+             f'desc="{request_metrics.query_count} queries"']
+    for name, value in sorted(request_metrics.timings.items()):
+        if name != 'db':
+            parts.append(f'{name};dur={value * 1000:.1f}')
+    hits = request_metrics.counters['cache_hits']
+    misses = request_metrics.counters['cache_misses']
+    parts.append(f'cache;desc="{hits} hits, {misses} misses"')
+    parts.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class PerformanceMiddleware:
+    """Считает, на что уходит время запроса, по имени представления.
+
+    SQL перехватывается execute_wrapper, шаблоны и кэш — обёртками из
+    core.backends, работа с картинками — в posts.thumbnails. Итог уходит
+    в заголовок Server-Timing и в реестр для /metrics/, медленные запросы
+    с их SQL выборочно пишутся в лог yatube.performance.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start(
+            settings.PERFORMANCE_MAX_LOGGED_QUERIES)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        duration = request_metrics.duration
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe(view, request_metrics, duration)
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(
+                request_metrics, duration)
+        if (duration >= settings.PERFORMANCE_SLOW_REQUEST
+                and random.random() < settings.PERFORMANCE_SLOW_SAMPLE_RATE):
+            self.log_slow(request, view, request_metrics, duration)
+        return response
+
+    def log_slow(self, request, view, request_metrics, duration):
+        queries = '\n'.join(
+            f'  {query_duration * 1000:.1f} мс: {sql}'
+            for sql, query_duration in request_metrics.queries)
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %d за %.0f мс\n%s',
+            request.method, request.path, view, duration * 1000,
+            request_metrics.query_count,
+            request_metrics.timings['db'] * 1000, queries)
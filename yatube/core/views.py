@@ -1,4 +1,17 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
+
+from posts.storage import is_content_addressed
+
+from .metrics import registry
+
+# Год — верхняя граница, которую соблюдают браузеры и CDN
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
 
 
 def page_not_found(request, exception):
@@ -12,3 +25,29 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def serve_media(request, path, document_root=None):
+    """Раздаёт медиафайлы; файлы, названные по хэшу, кэшируются навсегда."""
+    response = serve(request, path, document_root=document_root)
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True,
+                            max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Адресу клиента не доверяем: за прокси он у всех один.
+    """
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
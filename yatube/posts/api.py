@@ -0,0 +1,110 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from .conditional import (feed_etag, feed_last_modified, follow_etag,
+                          post_etag)
+from .models import Group, Post, User
+from .paginators import TimelinePaginator, get_page_obj
+from .views import get_comments_page
+
+# Без пробелов и \u-экранирования кириллицы ответ заметно короче
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def json_response(data, **kwargs):
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS, **kwargs)
+
+
+def api_login_required(view):
+    """Как login_required, но вместо редиректа на форму входа — 401."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Требуется авторизация'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group and post.group.slug,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_response(page, serialize):
+    return json_response({
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def feed_response(request, post_list, paginator=None):
+    page_obj = get_page_obj(request, post_list, paginator)
+    return page_response(page_obj, serialize_post)
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.feed().filter(group=group))
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, Post.objects.feed().filter(author=author))
+
+
+@require_safe
+@api_login_required
+@condition(etag_func=follow_etag)
+def follow_index(request):
+    return feed_response(
+        request,
+        Post.objects.feed().filter(author__following__user=request.user),
+        TimelinePaginator(request.user, settings.POSTS_IN_PAGE))
+
+
+@require_safe
+@condition(etag_func=post_etag)
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
+    data = serialize_post(post)
+    data['comments_count'] = post.comments_count
+    return json_response(data)
+
+
+@require_safe
+@condition(etag_func=post_etag)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return page_response(get_comments_page(request, post), serialize_comment)
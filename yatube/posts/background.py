@@ -0,0 +1,38 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='background')
+    return _executor
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        # Иначе исключение молча осталось бы в Future
+        logger.exception('Фоновая задача %s завершилась ошибкой',
+                         func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_after_commit(func, *args):
+    """Запускает func(*args) в фоновом потоке после фиксации транзакции.
+
+    Вызывающий код проверяет BACKGROUND_ASYNC: без него задачи
+    выполняются сразу, в потоке запроса.
+    """
+    transaction.on_commit(lambda: get_executor().submit(_run, func, args))
@@ -0,0 +1,173 @@
+import json
+import math
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Доля каждого представления в смеси запросов
+REQUEST_MIX = (
+    ('index', 30),
+    ('group_posts', 15),
+    ('profile', 15),
+    ('post_detail', 25),
+    ('follow_index', 10),
+    ('add_comment', 5),
+)
+PERCENTILES = (50, 95, 99)
+
+
+def generate_data(rng, users, groups, posts, follows, comments):
+    """Небольшой набор данных через обычные save(), с работой сигналов."""
+    authors = [User.objects.create_user(username=f'bench_{number}')
+               for number in range(users)]
+    group_list = [
+        Group.objects.create(title=f'Группа {number}',
+                             slug=f'bench-{number}', description='')
+        for number in range(groups)
+    ]
+    post_list = [
+        Post.objects.create(
+            text=f'Пост {number}', author=rng.choice(authors),
+            group=rng.choice(group_list + [None]))
+        for number in range(posts)
+    ]
+    pairs = set()
+    while len(pairs) < min(follows, users * (users - 1)):
+        user, author = rng.sample(authors, 2)
+        pairs.add((user, author))
+    for user, author in pairs:
+        Follow.objects.create(user=user, author=author)
+    for number in range(comments):
+        Comment.objects.create(text=f'Комментарий {number}',
+                               author=rng.choice(authors),
+                               post=rng.choice(post_list))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, rank):
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class Scenario:
+    """Воспроизводимая смесь запросов к публичным представлениям."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.users = list(User.objects.filter(
+            username__startswith='bench_').values_list('username', flat=True))
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.posts = list(Post.objects.values_list('id', flat=True))
+        self.anonymous = Client()
+        self.reader = Client()
+        self.reader.force_login(User.objects.get(username=self.users[0]))
+        names, weights = zip(*REQUEST_MIX)
+        self.names, self.weights = names, weights
+
+    def request(self, name):
+        rng = self.rng
+        if name == 'index':
+            return self.anonymous.get(reverse('posts:index'))
+        if name == 'group_posts':
+            return self.anonymous.get(reverse(
+                'posts:group_list', args=[rng.choice(self.groups)]))
+        if name == 'profile':
+            return self.anonymous.get(reverse(
+                'posts:profile', args=[rng.choice(self.users)]))
+        if name == 'post_detail':
+            return self.anonymous.get(reverse(
+                'posts:post_detail', args=[rng.choice(self.posts)]))
+        if name == 'follow_index':
+            return self.reader.get(reverse('posts:follow_index'))
+        return self.reader.post(
+            reverse('posts:add_comment', args=[rng.choice(self.posts)]),
+            {'text': 'Комментарий из бенчмарка'})
+
+    def run(self, requests):
+        """Возвращает {представление: [(секунды, запросы к БД)]} и время."""
+        samples = defaultdict(list)
+        cache.clear()
+        started = time.perf_counter()
+        for _ in range(requests):
+            name = self.rng.choices(self.names, self.weights)[0]
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                request_started = time.perf_counter()
+                response = self.request(name)
+                duration = time.perf_counter() - request_started
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f'{name}: ответ {response.status_code}')
+            samples[name].append((duration, counter.count))
+        return samples, time.perf_counter() - started
+
+
+def summarize(samples):
+    summary = {}
+    for name, values in sorted(samples.items()):
+        durations = [duration for duration, _ in values]
+        row = {'requests': len(values)}
+        for rank in PERCENTILES:
+            row[f'p{rank}_ms'] = round(
+                percentile(durations, rank) * 1000, 2)
+        row['queries'] = round(
+            sum(queries for _, queries in values) / len(values), 2)
+        summary[name] = row
+    return summary
+
+
+def regressions(summary, baseline, tolerance=None):
+    """Строки с превышением базовой линии.
+
+    Число запросов к БД детерминировано и сравнивается строго. Задержка
+    зависит от машины и шумит, поэтому сравнивается, только если задан
+    tolerance, и допускает превышение в tolerance раз.
+    """
+    problems = []
+    for name, row in summary.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if row['queries'] > expected['queries']:
+            problems.append(f'{name}: запросов к БД {row["queries"]}, '
+                            f'в базовой линии {expected["queries"]}')
+        if tolerance is None:
+            continue
+        if row['p95_ms'] > expected['p95_ms'] * tolerance:
+            problems.append(f'{name}: p95 {row["p95_ms"]} мс, в базовой '
+                            f'линии {expected["p95_ms"]} мс')
+    return problems
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, summary):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,127 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_cache_key, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_page
+
+GENERATION_KEY = 'posts:generation'
+CHANGED_AT_KEY = 'posts:changed_at'
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def bump_generation():
+    """Все закэшированные страницы лент становятся недействительными."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+def get_changed_at():
+    """Время последней смены поколения контента.
+
+    Если отметка пропала из кэша, считаем, что контент изменился только
+    что: лишний полный ответ лучше ошибочного 304.
+    """
+    changed_at = cache.get(CHANGED_AT_KEY)
+    if changed_at is None:
+        cache.add(CHANGED_AT_KEY, time.time(), timeout=None)
+        changed_at = cache.get(CHANGED_AT_KEY, time.time())
+    return datetime.fromtimestamp(changed_at, tz=timezone.utc)
+
+
+def acquire_rebuild_lock(key):
+    """Только один процесс из всех воркеров получает право пересборки."""
+    return cache.add(f'lock:{key}', True,
+                     timeout=settings.FEED_REBUILD_LOCK_TIMEOUT)
+
+
+def release_rebuild_lock(key):
+    cache.delete(f'lock:{key}')
+
+
+def feed_prefix(generation):
+    return f'feed.{generation}'
+
+
+def rebuild_lock_key(generation, url):
+    url_hash = hashlib.md5(url.encode()).hexdigest()
+    return f'{feed_prefix(generation)}.{url_hash}'
+
+
+def revalidate(response):
+    """Браузеры и прокси перепроверяют страницу при каждом запросе.
+
+    cache_page выставляет клиентам max-age своего таймаута, а серверная
+    копия живёт до смены поколения; свежесть клиенту подтверждает ETag.
+    """
+    patch_cache_control(response, max_age=0, no_cache=True)
+    del response['Expires']
+    return response
+
+
+def mark_stale(response, generation):
+    """Прошлая версия страницы не получает валидаторы текущей.
+
+    Иначе condition проставил бы ей свежие ETag и Last-Modified, и клиент
+    получал бы 304 на устаревшую копию. Такую страницу не хранят вовсе.
+    """
+    patch_cache_control(response, no_store=True)
+    response['ETag'] = '"stale-{}"'.format(generation)
+    response['Last-Modified'] = http_date(get_changed_at().timestamp() - 1)
+    return response
+
+
+def cache_feed_page(timeout):
+    """cache_page, ключ которого включает текущее поколение контента.
+
+    Вместо короткого TTL страница живёт, пока не изменится пост, группа
+    или комментарий: сигналы меняют поколение, и старые ключи больше
+    не читаются, а просто истекают. После смены поколения страницу
+    пересобирает один воркер, остальные до этого отдают прошлую версию.
+    Клиентам страница отдаётся без срока свежести.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return revalidate(serve(request, *args, **kwargs))
+
+        def serve(request, *args, **kwargs):
+            generation = get_generation()
+            cached_view = cache_page(
+                timeout, key_prefix=feed_prefix(generation))(view)
+            if request.method not in ('GET', 'HEAD'):
+                return cached_view(request, *args, **kwargs)
+            page_key = get_cache_key(
+                request, feed_prefix(generation), 'GET', cache=cache)
+            page = page_key and cache.get(page_key)
+            if page is not None:
+                return page
+            lock_key = rebuild_lock_key(
+                generation, request.build_absolute_uri())
+            if not acquire_rebuild_lock(lock_key):
+                stale_key = get_cache_key(
+                    request, feed_prefix(generation - 1), 'GET', cache=cache)
+                stale = stale_key and cache.get(stale_key)
+                if stale is not None:
+                    return mark_stale(stale, generation - 1)
+                return cached_view(request, *args, **kwargs)
+            try:
+                return cached_view(request, *args, **kwargs)
+            finally:
+                release_rebuild_lock(lock_key)
+        return wrapped
+    return decorator
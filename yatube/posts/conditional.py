@@ -0,0 +1,99 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from . import caching
+from .follows import follow_counts, follows_changed_at, profile_author
+from .models import Follow, Post
+
+
+def quote(*parts):
+    return '"{}"'.format('-'.join(str(part) for part in parts))
+
+
+def digest(*parts):
+    """ETag из значений, которые могут содержать что угодно."""
+    raw = '\0'.join(str(part) for part in parts)
+    return quote(hashlib.md5(raw.encode()).hexdigest())
+
+
+def feed_etag(request, *args, **kwargs):
+    """Валидатор лент без запроса к базе.
+
+    Любая запись поста, группы или комментария меняет поколение контента,
+    так что поколение и время его смены покрывают и новые посты, и правки,
+    и удаления.
+    """
+    return quote('feed', caching.get_generation())
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return caching.get_changed_at()
+
+
+def follow_etag(request, *args, **kwargs):
+    # Подписки не меняют поколение, поэтому их состояние — часть ETag;
+    # время подписки не хранится, так что Last-Modified у ленты нет
+    follows = Follow.objects.filter(user_id=request.user.pk).aggregate(
+        count=Count('id'), last=Max('id'))
+    return quote('follow', caching.get_generation(), request.user.pk,
+                 follows['count'], follows['last'])
+
+
+def post_etag(request, post_id, *args, **kwargs):
+    """Версия поста растёт при правке, счётчик — с комментариями."""
+    state = Post.objects.filter(pk=post_id).values_list(
+        'version', 'comments_count').first()
+    if state is None:
+        return None
+    return quote('post', post_id, *state)
+
+
+# HTML-страницы ещё зависят от того, кто их смотрит: шапка, кнопки
+# подписки и правки, форма комментария
+
+def page_etag(request, *args, **kwargs):
+    return quote('page', caching.get_generation(), request.user.pk)
+
+
+def follow_state(request, username):
+    """Счётчики подписок автора и подписан ли на него зритель.
+
+    Подписки не меняют поколение, так что страницы с ними зависят от
+    этих значений. None, если автора нет.
+    """
+    author = profile_author(request, username)
+    if author is None:
+        return None
+    return (*follow_counts(author), int(author.viewer_follows))
+
+
+def profile_etag(request, username, *args, **kwargs):
+    state = follow_state(request, username)
+    if state is None:
+        return None
+    return quote('profile', caching.get_generation(), request.user.pk,
+                 *state)
+
+
+def follows_etag(request, username, *args, **kwargs):
+    """Списки подписок меняются вместе со счётчиками автора."""
+    state = follow_state(request, username)
+    if state is None:
+        return None
+    # Кнопки подписки у каждого в списке зависят от подписок зрителя
+    changed_at = 0
+    if request.user.is_authenticated:
+        changed_at = follows_changed_at(request.user.pk)
+    return quote('follows', caching.get_generation(), request.user.pk,
+                 changed_at, *state)
+
+
+def post_detail_etag(request, post_id, *args, **kwargs):
+    """Пост, его комментарии, счётчик постов автора и группа."""
+    state = Post.objects.filter(pk=post_id).values_list(
+        'version', 'comments_count', 'author__stats__posts_count',
+        'group__title').first()
+    if state is None:
+        return None
+    return digest('post', post_id, request.user.pk, *state)
@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import BooleanField, Exists, OuterRef, Value
+
+from .models import Follow, UserStats
+
+User = get_user_model()
+
+# Метка в кэше: подписок слишком много, чтобы хранить их набором
+TOO_MANY = 'too-many'
+
+
+def profile_author(request, username):
+    """Автор профиля со счётчиками и подпиской зрителя или None.
+
+    Валидатор ETag и представление берут автора одним запросом: объект
+    запоминается на request.
+    """
+    authors = request.__dict__.setdefault('profile_authors', {})
+    if username not in authors:
+        viewer_follows = Value(False, output_field=BooleanField())
+        if request.user.is_authenticated:
+            viewer_follows = Exists(Follow.objects.filter(
+                user=request.user, author=OuterRef('pk')))
+        authors[username] = User.objects.select_related('stats').annotate(
+            viewer_follows=viewer_follows).filter(username=username).first()
+    return authors[username]
+
+
+def follow_counts(user):
+    """(подписчиков, подписок); без строки статистики — нули."""
+    try:
+        return user.stats.followers_count, user.stats.following_count
+    except UserStats.DoesNotExist:
+        return 0, 0
+
+
+def follow_set_key(user_id):
+    return f'follows.{user_id}'
+
+
+def follows_changed_key(user_id):
+    return f'follows.changed.{user_id}'
+
+
+def forget_follows(user_id):
+    """Сбрасывает кэш подписок user_id после подписки или отписки."""
+    cache.delete(follow_set_key(user_id))
+    cache.set(follows_changed_key(user_id), time.time(), timeout=None)
+
+
+def follows_changed_at(user_id):
+    """Отметка последней смены подписок user_id для ETag."""
+    changed_at = cache.get(follows_changed_key(user_id))
+    if changed_at is None:
+        cache.add(follows_changed_key(user_id), time.time(), timeout=None)
+        changed_at = cache.get(follows_changed_key(user_id), 0)
+    return changed_at
+
+
+def cached_follow_set(user):
+    """Все id авторов, на которых подписан user, или None.
+
+    None — подписок больше FOLLOW_SET_CACHE_LIMIT, и хранить их набором
+    дороже, чем проверять авторов страницы.
+    """
+    key = follow_set_key(user.pk)
+    follow_set = cache.get(key)
+    if follow_set is None:
+        limit = settings.FOLLOW_SET_CACHE_LIMIT
+        ids = set(Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True)[:limit + 1])
+        follow_set = ids if len(ids) <= limit else TOO_MANY
+        cache.set(key, follow_set, settings.FEED_CACHE_TIMEOUT)
+    return None if follow_set == TOO_MANY else follow_set
+
+
+def followed_authors(request, objects):
+    """id авторов из objects, на которых подписан зритель.
+
+    objects — посты, комментарии или пользователи. Небольшой набор
+    подписок берётся из кэша целиком, иначе неизвестные авторы
+    дочитываются одним запросом на вызов; ответы запоминаются на request.
+    """
+    if not request.user.is_authenticated:
+        return set()
+    author_ids = {getattr(item, 'author_id', item.pk) for item in objects}
+    if not hasattr(request, 'follow_set'):
+        request.follow_set = cached_follow_set(request.user)
+    if request.follow_set is not None:
+        return author_ids & request.follow_set
+    known = request.__dict__.setdefault('followed_authors', {})
+    missing = author_ids - known.keys()
+    if missing:
+        found = set(Follow.objects.filter(
+            user=request.user, author_id__in=missing
+        ).values_list('author_id', flat=True))
+        known.update((author_id, author_id in found) for author_id in missing)
+    return {author_id for author_id in author_ids if known[author_id]}
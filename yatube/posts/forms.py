@@ -1,8 +1,71 @@
+from io import BytesIO
+
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
 
 from .models import Post, Comment
 
 
+def file_too_large():
+    return ValidationError(
+        'Файл больше %(limit)s',
+        code='file_too_large',
+        params={'limit': filesizeformat(settings.POST_IMAGE_MAX_SIZE)},
+    )
+
+
+def check_image_limits(upload):
+    """Отсекает слишком большие файлы и картинки до распаковки пикселей."""
+    if upload.size > settings.POST_IMAGE_MAX_SIZE:
+        raise file_too_large()
+    upload.seek(0)
+    try:
+        # Image.open читает только заголовок
+        with Image.open(upload) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = settings.POST_IMAGE_MAX_PIXELS
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое разрешение картинки',
+            code='too_many_pixels',
+        )
+
+
+def normalize_image(upload):
+    """Уменьшает слишком крупную картинку и убирает из неё метаданные.
+
+    MPO с камер сохраняется как обычный JPEG из основного кадра, прочая
+    анимация остаётся как есть.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = 'JPEG' if image.format == 'MPO' else image.format
+        if image_format != 'JPEG' and getattr(image, 'is_animated', False):
+            return upload
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        # Писатель PNG берёт EXIF из info, если его не передать явно;
+        # из info нужна только прозрачность палитры
+        image.info = {key: value for key, value in image.info.items()
+                      if key == 'transparency'}
+        side = settings.POST_IMAGE_MAX_SIDE
+        image.thumbnail((side, side), Image.LANCZOS)
+        options = {'exif': b''}
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        if image_format == 'JPEG':
+            options['quality'] = 90
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
@@ -12,6 +75,20 @@ class PostForm(forms.ModelForm):
                       'group': 'Группа, к которой будет относиться пост',
                       'image': 'Ваша картинка к посту'}
 
+    def __init__(self, *args, oversized_files=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Поля, файлы которых обработчик загрузки отбросил по размеру
+        self.oversized_files = oversized_files
+
+    def clean_image(self):
+        if 'image' in self.oversized_files:
+            raise file_too_large()
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            check_image_limits(image)
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
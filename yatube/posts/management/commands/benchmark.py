@@ -0,0 +1,85 @@
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases,
+                               teardown_test_environment)
+
+from posts.benchmark import (PERCENTILES, Scenario, generate_data,
+                             load_baseline, regressions, save_baseline,
+                             summarize)
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks',
+                                'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон публичных представлений на временной базе '
+            'со сравнением с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=300)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новую базовую линию')
+        parser.add_argument(
+            '--check-latency', action='store_true',
+            help='Сравнивать и p95 с базовой линией; имеет смысл, если '
+                 'она записана на этой же машине')
+        parser.add_argument(
+            '--tolerance', type=float, default=1.5,
+            help='Во сколько раз p95 может превысить базовую линию')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Данные генерируются во временной базе, рабочая не затрагивается
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            summary, elapsed, total = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        self.report(summary, elapsed, total)
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            save_baseline(options['baseline'], summary)
+            self.stdout.write(f'Базовая линия: {options["baseline"]}')
+            return
+        tolerance = options['tolerance'] if options['check_latency'] else None
+        problems = regressions(summary, load_baseline(options['baseline']),
+                               tolerance)
+        if problems:
+            raise CommandError('Регрессия:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        generate_data(rng, options['users'], options['groups'],
+                      options['posts'], options['follows'],
+                      options['comments'])
+        self.stdout.write(
+            f'Данные: {time.perf_counter() - started:.1f} с')
+        samples, elapsed = Scenario(rng).run(options['requests'])
+        return summarize(samples), elapsed, options['requests']
+
+    def report(self, summary, elapsed, total):
+        columns = ['requests'] + [f'p{rank}_ms' for rank in PERCENTILES]
+        columns.append('queries')
+        self.stdout.write(f'{"view":<14}' + ''.join(
+            f'{column:>10}' for column in columns))
+        for name, row in summary.items():
+            self.stdout.write(f'{name:<14}' + ''.join(
+                f'{row[column]:>10}' for column in columns))
+        self.stdout.write(f'Пропускная способность: {total / elapsed:.0f} '
+                          f'запросов/с')
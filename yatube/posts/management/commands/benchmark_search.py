@@ -0,0 +1,105 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from posts.search import FTS_SCHEMA, FTS_TABLE
+
+SYLLABLES = ('ка', 'ло', 'ми', 'ра', 'то', 'не', 'по', 'сто', 'вер', 'дом',
+             'кот', 'лес', 'мор', 'ре', 'ча', 'ши', 'зу', 'бы', 'ве', 'гу')
+VOCABULARY_SIZE = 5000
+# Ранги слов для запросов: частое, среднее, редкое
+QUERY_RANKS = (0, 100, 2000)
+LIMIT = 10
+
+
+def make_vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words, key=lambda word: (len(word), word))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск FTS5 с icontains (LIKE) на синтетической '
+            'таблице постов во временной базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = make_vocabulary(rng)
+        # Закон Ципфа: частота слова обратна его рангу
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'bench.sqlite3'))
+            started = time.perf_counter()
+            self.fill(db, rng, vocabulary, weights, options['rows'])
+            self.stdout.write(
+                f'Постов: {options["rows"]}, подготовка '
+                f'{time.perf_counter() - started:.1f} с')
+            for rank in QUERY_RANKS:
+                word = vocabulary[rank]
+                self.compare(db, word, options['repeat'])
+            db.close()
+
+    def fill(self, db, rng, vocabulary, weights, rows):
+        db.execute('CREATE TABLE posts_post '
+                   '(id INTEGER PRIMARY KEY, text TEXT NOT NULL)')
+        cum_weights = list(accumulate(weights))
+        batch = []
+        for pk in range(1, rows + 1):
+            words = rng.choices(vocabulary, cum_weights=cum_weights,
+                                k=rng.randint(20, 60))
+            batch.append((pk, ' '.join(words)))
+            if len(batch) == 10_000:
+                db.executemany('INSERT INTO posts_post VALUES (?, ?)', batch)
+                batch = []
+        db.executemany('INSERT INTO posts_post VALUES (?, ?)', batch)
+        # Та же схема индекса, что и в проекте
+        for statement in FTS_SCHEMA:
+            db.execute(statement)
+        db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        db.commit()
+
+    def compare(self, db, word, repeat):
+        like = (f'%{word}%',)
+        match = (f'"{word}"*',)
+        # Первая страница и число совпадений: LIKE быстро находит
+        # частые слова в начале таблицы, но считать и искать редкие
+        # может только полным сканированием
+        cases = (
+            ('icontains, страница',
+             "SELECT id FROM posts_post WHERE text LIKE ? ESCAPE '\\' "
+             f'ORDER BY id DESC LIMIT {LIMIT}', like),
+            ('FTS5 bm25, страница',
+             f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? '
+             f'ORDER BY bm25({FTS_TABLE}) LIMIT {LIMIT}', match),
+            ('FTS5 новые, страница',
+             f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? '
+             f'ORDER BY rowid DESC LIMIT {LIMIT}', match),
+            ('icontains, COUNT',
+             "SELECT COUNT(*) FROM posts_post WHERE text LIKE ? "
+             "ESCAPE '\\'", like),
+            ('FTS5, COUNT',
+             f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?',
+             match),
+        )
+        matches = db.execute(cases[-1][1], match).fetchone()[0]
+        self.stdout.write(f'«{word}», совпадений {matches}:')
+        for name, sql, params in cases:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                db.execute(sql, params).fetchall()
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'  {name:<22} {statistics.median(timings) * 1000:9.2f} мс')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import prepare_images
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры и варианты картинок постов, у которых их ещё нет'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            thumbnail_url='').values_list('id', flat=True)
+        done = 0
+        for post_id in posts.iterator():
+            prepare_images(post_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Follow, Post, UserStats
+
+User = get_user_model()
+
+COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def count_of(queryset, field):
+    """Подзапрос с числом строк queryset, где field — id пользователя."""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики UserStats и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        rows = User.objects.annotate(
+            posts_total=count_of(Post.objects, 'author'),
+            followers_total=count_of(Follow.objects, 'author'),
+            following_total=count_of(Follow.objects, 'user'),
+        ).values_list(
+            'id', 'username', 'posts_total', 'followers_total',
+            'following_total', *(f'stats__{name}' for name in COUNTERS)
+        ).order_by('id')
+        fixed = 0
+        for user_id, username, *values in rows.iterator():
+            totals, stored = values[:3], [value or 0 for value in values[3:]]
+            if totals == stored:
+                continue
+            fixed += 1
+            self.stdout.write(f'{username}: {stored[0]} -> {totals[0]}'
+                              if totals[1:] == stored[1:] else
+                              f'{username}: {stored} -> {totals}')
+            if not options['dry_run']:
+                UserStats.objects.update_or_create(
+                    user_id=user_id, defaults=dict(zip(COUNTERS, totals)))
+        self.stdout.write(self.style.SUCCESS(f'Расхождений: {fixed}'))
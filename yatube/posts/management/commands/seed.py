@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = ('Быстро наполняет базу пользователями, группами, постами, '
+            'подписками и комментариями через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой-заглушкой, от 0 до 1')
+        parser.add_argument('--batch', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного закона для авторов и групп')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['groups'] < 1:
+            raise CommandError('Нужны хотя бы два пользователя и одна группа')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images должен быть от 0 до 1')
+        started = time.perf_counter()
+
+        def log(message):
+            self.stdout.write(
+                f'{message} ({time.perf_counter() - started:.1f} с)')
+
+        Seeder(seed=options['seed'], batch_size=options['batch'],
+               skew=options['skew'], days=options['days'], log=log).run(
+            options['users'], options['groups'], options['posts'],
+            options['follows'], options['comments'], options['images'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с. Миниатюры: '
+            f'manage.py generate_thumbnails'))
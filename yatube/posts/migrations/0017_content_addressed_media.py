@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:45
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_postimagevariant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.AlterField(
+            model_name='postimagevariant',
+            name='file',
+            field=models.FileField(db_index=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/variants/'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+def fill_following_count(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    counts = Follow.objects.filter(
+        user__isnull=False, author__isnull=False
+    ).values('user').annotate(total=models.Count('id')).order_by()
+    for row in counts:
+        UserStats.objects.update_or_create(
+            user_id=row['user'], defaults={'following_count': row['total']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', '-id'], name='follow_author_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', '-id'], name='follow_user_id_idx'),
+        ),
+        migrations.RunPython(fill_following_count, migrations.RunPython.noop),
+    ]
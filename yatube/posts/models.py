@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import content_storage
+
 User = get_user_model()
 
 
@@ -13,6 +15,18 @@ class Group(models.Model):
         return self.title[:15]
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        # Всё, что выводит карточка поста, одним запросом с JOIN
+        return self.select_related('author', 'group').prefetch_related(
+            'image_variants'
+        ).only(
+            'id', 'text', 'pub_date', 'image', 'thumbnail_url', 'version',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -30,8 +44,29 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=content_storage,
+        db_index=True,
         blank=True
     )
+    # Адрес готовой миниатюры для ленты, заполняется фоновым воркером
+    thumbnail_url = models.CharField(max_length=255, blank=True,
+                                     editable=False)
+    # Растёт при каждом изменении, входит в ключ кэша карточки поста
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Поддерживается сигналами, чтобы не считать комментарии на странице
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -51,6 +86,12 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -77,3 +118,95 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique_follow'),
         ]
+        # Списки подписчиков и подписок листаются курсором по id
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='follow_author_id_idx'),
+            models.Index(fields=['user', '-id'],
+                         name='follow_user_id_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые дорого считать на каждый запрос."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста нужной ширины и формата."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    file = models.FileField(upload_to='posts/variants/',
+                            storage=content_storage, db_index=True)
+    size = models.PositiveIntegerField(help_text='Размер файла в байтах')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='unique_image_variant'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.format} {self.width}w'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя, разложенный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Копия post.pub_date, чтобы лента читалась одним индексом
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.post}'
+
+
+def posts_count(user):
+    """Число постов из счётчика; без строки статистики постов нет."""
+    try:
+        return user.stats.posts_count
+    except UserStats.DoesNotExist:
+        return 0
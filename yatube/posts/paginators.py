@@ -0,0 +1,332 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import get_generation
+from .follows import follows_changed_at
+from .models import Post, TimelineEntry
+from .timeline import fan_out_on_read_authors
+
+FEED_ORDERING = ('-pub_date', '-id')
+
+
+def pack_cursor(*parts):
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(token):
+    """Части курсора строками или None, если курсор не декодируется."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return raw.decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_cursor(post):
+    return pack_cursor(post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) или None, если курсор битый."""
+    parts = unpack_cursor(token)
+    if parts is None:
+        return None
+    try:
+        pub_date, pk = parts
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET каждая страница читается одним диапазонным
+    запросом от строки, закодированной в курсоре, поэтому глубокие
+    страницы стоят столько же, сколько первая. Пагинатор знает только
+    текущее окно: номер страницы 1 или 2 и ещё одна страница, если
+    дальше есть записи, — этого достаточно для методов Page.
+    """
+    # Поля object_list, по которым идёт сортировка и сравнение с курсором
+    keys = ('pub_date', 'id')
+    # Первая страница — самые новые записи
+    newest_first = True
+    # Часть ключа кэша числа записей для старых ссылок ?page=, если
+    # записи зависят не только от поколения контента
+    count_key = ''
+
+    def __init__(self, object_list, per_page, **kwargs):
+        ordering = self.ordering(self.keys, self.newest_first)
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def to_posts(self, rows):
+        return rows
+
+    def make_cursor(self, post):
+        return encode_cursor(post)
+
+    @staticmethod
+    def ordering(keys, descending):
+        return tuple(f'-{key}' if descending else key for key in keys)
+
+    def read_window(self, queryset, after=None, before=None, keys=None):
+        """До per_page + 1 записей за курсором в порядке чтения.
+
+        Без курсора и с after записи идут в порядке страниц (для лент —
+        от новых к старым), с before — в обратном.
+        """
+        date_key, id_key = keys or self.keys
+        descending = self.newest_first == (before is None)
+        cursor, direction = before or after, 'lt' if descending else 'gt'
+        if cursor is not None:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{date_key}__{direction}': pub_date})
+                | Q(**{date_key: pub_date, f'{id_key}__{direction}': pk})
+            )
+        ordering = self.ordering((date_key, id_key), descending)
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def get_window(self, after=None, before=None):
+        return self.to_posts(
+            self.read_window(self.object_list, after, before))
+
+    def cursor_page(self, after=None, before=None):
+        window = self.get_window(after, before)
+        has_more = len(window) > self.per_page
+        window = window[:self.per_page]
+        if before is not None:
+            window = window[::-1]
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = after is not None, has_more
+        if not window:
+            has_next = has_previous = False
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        return set_cursors(Page(window, number, self), self.make_cursor)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от старых к новым по (created, id)."""
+    keys = ('created', 'id')
+    newest_first = False
+
+    def make_cursor(self, comment):
+        return pack_cursor(comment.created.isoformat(), comment.pk)
+
+
+def decode_id_cursor(token):
+    parts = unpack_cursor(token)
+    try:
+        (pk,) = parts
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+class FollowPaginator(CursorPaginator):
+    """Подписчики или подписки от новых к старым по id подписки.
+
+    Окно читается по индексам (author, -id) и (user, -id); side — какую
+    сторону подписки показывать, 'user' или 'author'.
+    """
+    keys = ('id',)
+
+    def __init__(self, follows, per_page, side, **kwargs):
+        super().__init__(follows.select_related(f'{side}__stats'),
+                         per_page, **kwargs)
+        self.side = side
+
+    def read_window(self, queryset, after=None, before=None, keys=None):
+        descending = self.newest_first == (before is None)
+        cursor = before or after
+        if cursor is not None:
+            direction = 'lt' if descending else 'gt'
+            queryset = queryset.filter(**{f'id__{direction}': cursor})
+        ordering = self.ordering(self.keys, descending)
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def to_posts(self, rows):
+        users = []
+        for follow in rows:
+            user = getattr(follow, self.side)
+            user.follow_id = follow.pk
+            users.append(user)
+        return users
+
+    def make_cursor(self, user):
+        return pack_cursor(user.follow_id)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок из материализованной таблицы TimelineEntry.
+
+    Посты авторов с огромным числом подписчиков в таблицу не
+    раскладываются: их окно читается отдельно и сливается с окном ленты.
+    """
+    keys = ('pub_date', 'post_id')
+
+    def __init__(self, user, per_page, **kwargs):
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post', 'post__author', 'post__group'
+        ).prefetch_related('post__image_variants')
+        super().__init__(entries, per_page, **kwargs)
+        self.user = user
+
+    @property
+    def count_key(self):
+        # Подписка и отписка не меняют поколение контента
+        return f'follows.{follows_changed_at(self.user.pk)}'
+
+    def to_posts(self, rows):
+        return [entry.post for entry in rows]
+
+    def get_window(self, after=None, before=None):
+        window = super().get_window(after, before)
+        authors = fan_out_on_read_authors(self.user)
+        if not authors:
+            return window
+        window += self.read_window(
+            Post.objects.feed().filter(author__in=authors),
+            after, before, keys=CursorPaginator.keys)
+        # Старые копии в ленте могли остаться с тех пор, как автор
+        # раскладывался при записи
+        unique = {post.pk: post for post in window}.values()
+        return sorted(unique, key=lambda post: (post.pub_date, post.pk),
+                      reverse=before is None)
+
+
+def estimated_rows(queryset):
+    """Число строк таблицы по статистике планировщика или None.
+
+    Статистику собирает ANALYZE, поэтому оценка отстаёт от таблицы.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # Первое число stat — строк в таблице
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    rows = int(str(row[0]).split()[0])
+    return rows if rows > 0 else None
+
+
+class CachedCountPaginator(Paginator):
+    """Нумерованные страницы без COUNT(*) на каждый запрос.
+
+    Число записей хранится в кэше до смены поколения контента, то есть
+    до сохранения или удаления поста, группы или комментария; key
+    различает выборки, зависящие от чего-то ещё. Для целой таблицы
+    больше PAGINATOR_ESTIMATE_ABOVE строк берётся оценка из статистики
+    планировщика, и approximate становится True. Если кэш или оценка
+    завысили число и страница оказалась пустой, записи пересчитываются
+    точно, а номер прижимается к последней странице.
+    """
+    numbered = True
+    approximate = False
+
+    def __init__(self, object_list, per_page, key='', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.key = key
+        self.exact = False
+
+    def count_cache_key(self):
+        sql = str(self.object_list.query).encode()
+        return (f'count.{get_generation()}.{self.key}.'
+                f'{hashlib.md5(sql).hexdigest()}')
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_rows(self.object_list)
+            if (estimate is not None
+                    and estimate > settings.PAGINATOR_ESTIMATE_ABOVE):
+                self.approximate = True
+                return estimate
+        count = cache.get(self.count_cache_key())
+        if count is None:
+            count = self.recount()
+        return count
+
+    def recount(self):
+        count = self.object_list.count()
+        cache.set(self.count_cache_key(), count,
+                  settings.FEED_CACHE_TIMEOUT)
+        self.__dict__.update(count=count, exact=True, approximate=False)
+        self.__dict__.pop('num_pages', None)
+        return count
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = list(page.object_list)
+        if page.object_list or page.number == 1 or self.exact:
+            return page
+        self.recount()
+        return self.page(min(page.number, self.num_pages))
+
+
+def set_cursors(page, make_cursor=encode_cursor):
+    page.next_cursor = None
+    page.previous_cursor = None
+    if not page.object_list:
+        return page
+    if page.has_next():
+        page.next_cursor = make_cursor(page.object_list[-1])
+    if page.has_previous():
+        page.previous_cursor = make_cursor(page.object_list[0])
+    return page
+
+
+def get_page_obj(request, post_list, paginator=None):
+    """Страница ленты по ?after=/?before= или по старым ссылкам ?page=.
+
+    paginator задаёт источник курсорных страниц, если он отличается от
+    post_list; старые ссылки ?page= всегда читают post_list.
+    """
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before'))
+    page_number = request.GET.get('page')
+    if after is None and before is None and page_number is not None:
+        numbered = CachedCountPaginator(
+            post_list.order_by(*FEED_ORDERING), settings.POSTS_IN_PAGE,
+            key=paginator.count_key if paginator is not None else '')
+        return set_cursors(numbered.get_page(page_number))
+    if paginator is None:
+        paginator = CursorPaginator(post_list, settings.POSTS_IN_PAGE)
+    return paginator.cursor_page(after=after, before=before)
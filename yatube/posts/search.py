@@ -0,0 +1,164 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_post_fts'
+FTS_TRIGGERS = ('posts_post_fts_insert', 'posts_post_fts_delete',
+                'posts_post_fts_update')
+# Индекс хранит только токены, сам текст читается из posts_post
+FTS_SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+)
+SNIPPET_TOKENS = 16
+# Управляющие символы не встречаются в постах и переживают escape()
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def search_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection, repair_only=False):
+    """Создаёт индекс и триггеры, если их нет, и заполняет индекс.
+
+    Миграции SQLite пересоздают таблицу posts_post при изменении полей,
+    и триггеры пропадают вместе со старой таблицей, поэтому после каждого
+    migrate существующий индекс чинится с repair_only=True.
+    """
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            (FTS_TABLE,) + FTS_TRIGGERS)
+        found = {row[0] for row in cursor.fetchall()}
+        if len(found) == len(FTS_TRIGGERS) + 1:
+            return
+        if repair_only and FTS_TABLE not in found:
+            return
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_triggers(using=connection):
+    """Для массовой вставки: потом индекс целиком пересобирает install."""
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        for trigger in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def uninstall(using=connection):
+    drop_triggers(using)
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое как префикс.
+
+    Синтаксис FTS5 (кавычки, NEAR, OR) наружу не пропускаем.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для pk__in."""
+    match = match_expression(query)
+    if not match:
+        return []
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,))
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+def decode_search_cursor(token):
+    """Возвращает (релевантность, id) или None, если курсор битый."""
+    parts = unpack_cursor(token)
+    if parts is None:
+        return None
+    try:
+        score, pk = parts
+        return float(score), int(pk)
+    except ValueError:
+        return None
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по релевантности с keyset-пагинацией.
+
+    Курсор — пара (bm25, id): bm25 тем меньше, чем запись релевантнее,
+    так что страницы идут по возрастанию пары.
+    """
+
+    def __init__(self, query, per_page, **kwargs):
+        super().__init__(Post.objects.feed(), per_page, **kwargs)
+        self.match = match_expression(query)
+
+    def make_cursor(self, post):
+        return pack_cursor(repr(post.search_score), post.pk)
+
+    def read_window(self, queryset, after=None, before=None, keys=None):
+        if not self.match:
+            return []
+        sql = [f"""SELECT rowid, bm25({FTS_TABLE}),
+                   snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+                   FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"""]
+        params = [MARK_START, MARK_END, SNIPPET_TOKENS, self.match]
+        cursor, direction = before or after, '<' if before else '>'
+        if cursor is not None:
+            score, pk = cursor
+            sql.append(f"""AND (bm25({FTS_TABLE}) {direction} %s OR
+                (bm25({FTS_TABLE}) = %s AND rowid {direction} %s))""")
+            params += [score, score, pk]
+        order = 'DESC' if before else 'ASC'
+        sql.append(f'ORDER BY bm25({FTS_TABLE}) {order}, rowid {order} '
+                   'LIMIT %s')
+        params.append(self.per_page + 1)
+        with connection.cursor() as db:
+            db.execute(' '.join(sql), params)
+            rows = db.fetchall()
+        posts = queryset.in_bulk([row[0] for row in rows])
+        window = []
+        for pk, score, snippet in rows:
+            # Пост мог удалиться между двумя запросами
+            if pk in posts:
+                post = posts[pk]
+                post.search_score = score
+                post.snippet = highlight(snippet)
+                window.append(post)
+        return window
@@ -0,0 +1,263 @@
+import random
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from . import caching, search
+from .models import (Comment, Follow, Group, Post, TimelineEntry,
+                     UserStats)
+from .storage import content_storage
+
+User = get_user_model()
+
+SYLLABLES = ('ка', 'ло', 'ми', 'ра', 'то', 'не', 'по', 'сто', 'вер', 'дом',
+             'кот', 'лес', 'мор', 'ре', 'ча', 'ши', 'зу', 'бы', 'ве', 'гу')
+PLACEHOLDER_COLORS = ('#e63946', '#f1faee', '#a8dadc', '#457b9d', '#1d3557',
+                      '#2a9d8f', '#e9c46a', '#f4a261', '#264653', '#8ab17d')
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса степенного закона: i-й элемент с весом 1/i^skew."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+@contextmanager
+def keep_dates(*fields):
+    """bulk_create с auto_now_add перезаписал бы даты на текущее время."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Seeder:
+    """Массовая генерация данных через bulk_create пачками.
+
+    Авторы постов, группы, популярность авторов у подписчиков и
+    комментарии к постам распределены по степенному закону. Всё, что
+    обычно поддерживают сигналы (UserStats, счётчики комментариев,
+    ленты подписок, индекс поиска), считается здесь же, поэтому id
+    выдаются явно, а не возвращаются из базы.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, skew=1.1, days=365,
+                 log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.skew = skew
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.words = self.make_words(2000)
+
+    def make_words(self, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(
+                self.rng.choices(SYLLABLES, k=self.rng.randint(1, 4))))
+        return sorted(words)
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.words, k=self.rng.randint(low, high))).capitalize()
+
+    def insert(self, model, objects):
+        # Размер одного INSERT подберёт бэкенд: у SQLite лимит на число
+        # строк, а пачка batch_size — это одна транзакция
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+        objects.clear()
+
+    def run(self, users, groups, posts, follows, comments, images=0.0):
+        search.drop_triggers()
+        try:
+            self.create_users(users)
+            self.create_groups(groups)
+            self.create_follows(follows)
+            placeholders = self.create_placeholders() if images else []
+            self.create_posts(posts, comments, images, placeholders)
+            self.create_comments()
+            self.create_stats()
+        finally:
+            search.install(repair_only=True)
+        with connection.cursor() as cursor:
+            # id выдавались явно: последовательности PostgreSQL надо
+            # догнать, у SQLite список запросов пуст
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Group, Post]):
+                cursor.execute(sql)
+            # Планировщику нужна свежая статистика по индексам
+            cursor.execute('ANALYZE')
+        caching.bump_generation()
+
+    def create_users(self, count):
+        self.first_user = next_id(User)
+        password = make_password(None)
+        batch = []
+        for user_id in range(self.first_user, self.first_user + count):
+            batch.append(User(id=user_id, username=f'user{user_id}',
+                              first_name=self.rng.choice(self.words).title(),
+                              password=password))
+            if len(batch) >= self.batch_size:
+                self.insert(User, batch)
+        self.insert(User, batch)
+        self.users = count
+        self.user_weights = zipf_weights(count, self.skew)
+        self.log(f'Пользователей: {count}')
+
+    def create_groups(self, count):
+        first = next_id(Group)
+        Group.objects.bulk_create(
+            Group(id=group_id, title=f'Группа {group_id}',
+                  slug=f'group-{group_id}', description=self.text(5, 20))
+            for group_id in range(first, first + count))
+        self.group_ids = list(range(first, first + count))
+        self.group_weights = zipf_weights(count, self.skew)
+        self.log(f'Групп: {count}')
+
+    def pick_users(self, count, order=None):
+        """Индексы пользователей по степенному закону.
+
+        order — перестановка пользователей, от самого частого к редкому.
+        """
+        return self.rng.choices(order or range(self.users),
+                                cum_weights=self.user_weights, k=count)
+
+    def create_follows(self, count):
+        count = min(count, self.users * (self.users - 1))
+        self.followers = defaultdict(list)
+        self.followers_count = array('I', [0]) * self.users
+        self.following_count = array('I', [0]) * self.users
+        # Популярность у подписчиков не совпадает с активностью авторов,
+        # иначе ленты самых плодовитых авторов раздуваются квадратично
+        popular = list(range(self.users))
+        self.rng.shuffle(popular)
+        seen = set()
+        batch = []
+        while len(seen) < count:
+            for author in self.pick_users(count - len(seen), popular):
+                user = self.rng.randrange(self.users)
+                pair = user * self.users + author
+                if user == author or pair in seen:
+                    continue
+                seen.add(pair)
+                self.followers[author].append(user)
+                self.followers_count[author] += 1
+                self.following_count[user] += 1
+                batch.append(Follow(user_id=self.first_user + user,
+                                    author_id=self.first_user + author))
+                if len(batch) >= self.batch_size:
+                    self.insert(Follow, batch)
+        self.insert(Follow, batch)
+        self.log(f'Подписок: {count}')
+
+    def create_placeholders(self):
+        names = []
+        for color in PLACEHOLDER_COLORS:
+            buffer = BytesIO()
+            Image.new('RGB', (960, 640), color).save(buffer, 'JPEG')
+            # Хранилище по хэшу: повторный запуск не плодит файлы
+            names.append(content_storage.save(
+                'posts/placeholder.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def create_posts(self, count, comments, images, placeholders):
+        self.first_post = next_id(Post)
+        self.posts = count
+        self.posts_count = array('I', [0]) * self.users
+        self.comments_count = array('I', [0]) * count
+        for post in self.rng.choices(range(count), k=comments,
+                                     cum_weights=zipf_weights(count, 1)):
+            self.comments_count[post] += 1
+        # Посты идут по времени за последние days дней
+        now = timezone.now()
+        self.started = now - timedelta(days=self.days)
+        self.step = timedelta(days=self.days) / max(count, 1)
+        authors = self.pick_users(count)
+        limit = settings.TIMELINE_FANOUT_LIMIT
+        posts, entries = [], []
+        with keep_dates(Post._meta.get_field('pub_date')):
+            for index, author in enumerate(authors):
+                post_id = self.first_post + index
+                author_id = self.first_user + author
+                pub_date = self.pub_date(index)
+                group_id = None
+                if self.rng.random() < 0.7:
+                    group_id = self.rng.choices(
+                        self.group_ids, cum_weights=self.group_weights)[0]
+                image = ''
+                if placeholders and self.rng.random() < images:
+                    image = self.rng.choice(placeholders)
+                posts.append(Post(
+                    id=post_id, text=self.text(10, 60), author_id=author_id,
+                    group_id=group_id, pub_date=pub_date, image=image,
+                    comments_count=self.comments_count[index]))
+                self.posts_count[author] += 1
+                if self.followers_count[author] <= limit:
+                    entries.extend(
+                        TimelineEntry(user_id=self.first_user + user,
+                                      post_id=post_id, author_id=author_id,
+                                      pub_date=pub_date)
+                        for user in self.followers[author])
+                if max(len(posts), len(entries)) >= self.batch_size:
+                    # Записи ленты ссылаются на посты, посты идут первыми
+                    self.insert(Post, posts)
+                    self.insert(TimelineEntry, entries)
+            self.insert(Post, posts)
+            self.insert(TimelineEntry, entries)
+        self.log(f'Постов: {count}')
+
+    def pub_date(self, index):
+        return self.started + self.step * index
+
+    def create_comments(self):
+        batch = []
+        total = 0
+        with keep_dates(Comment._meta.get_field('created')):
+            for index, count in enumerate(self.comments_count):
+                pub_date = self.pub_date(index)
+                for _ in range(count):
+                    batch.append(Comment(
+                        post_id=self.first_post + index,
+                        author_id=self.first_user
+                        + self.rng.randrange(self.users),
+                        text=self.text(3, 30),
+                        created=pub_date + timedelta(
+                            seconds=self.rng.randrange(86400))))
+                    if len(batch) >= self.batch_size:
+                        total += len(batch)
+                        self.insert(Comment, batch)
+            total += len(batch)
+            self.insert(Comment, batch)
+        self.log(f'Комментариев: {total}')
+
+    def create_stats(self):
+        batch = []
+        for user in range(self.users):
+            batch.append(UserStats(
+                user_id=self.first_user + user,
+                posts_count=self.posts_count[user],
+                followers_count=self.followers_count[user],
+                following_count=self.following_count[user]))
+            if len(batch) >= self.batch_size:
+                self.insert(UserStats, batch)
+        self.insert(UserStats, batch)
@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.db.models import F
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, follows, search, timeline
+from .models import (Comment, Follow, Group, Post, PostImageVariant,
+                     UserStats)
+from .storage import is_content_addressed, unclaim_on_commit
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_version(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance.version += 1
+
+
+def is_referenced(name):
+    return (Post.objects.filter(image=name).exists()
+            or PostImageVariant.objects.filter(file=name).exists())
+
+
+def release_file(storage, name):
+    """Удаляет файл, если на него больше не ссылается ни одна запись.
+
+    Одинаковые картинки хранятся одним файлом, так что ссылки считаем
+    прямо по индексированным полям, а не отдельным счётчиком. Файлы,
+    сохранённые до хранилища по хэшу, не трогаем. Удаление ждёт
+    фиксации транзакции: при откате запись осталась бы без файла.
+    """
+    if not name or not is_content_addressed(name):
+        return
+    transaction.on_commit(
+        lambda: storage.release(name, lambda: is_referenced(name)))
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_image(sender, instance, raw=False, **kwargs):
+    if instance.pk is None or raw:
+        return
+    instance._old_image = Post.objects.filter(
+        pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if created or old_image != instance.image.name:
+        unclaim_on_commit(instance.image.name)
+    if old_image and old_image != instance.image.name:
+        release_file(instance.image.storage, old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    release_file(instance.image.storage, instance.image.name)
+
+
+@receiver(post_save, sender=PostImageVariant)
+def keep_variant_file(sender, instance, **kwargs):
+    unclaim_on_commit(instance.file.name)
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def release_variant_file(sender, instance, **kwargs):
+    release_file(instance.file.storage, instance.file.name)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if not created:
+        return
+    UserStats.objects.get_or_create(user_id=instance.author_id)
+    UserStats.objects.filter(user_id=instance.author_id).update(
+        posts_count=F('posts_count') + 1)
+    timeline.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    # Строку не создаём: при удалении пользователя её уже нет
+    UserStats.objects.filter(
+        user_id=instance.author_id, posts_count__gt=0
+    ).update(posts_count=F('posts_count') - 1)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, **kwargs):
+    if not created or instance.user_id is None or instance.author_id is None:
+        return
+    for user_id in (instance.author_id, instance.user_id):
+        UserStats.objects.get_or_create(user_id=user_id)
+    UserStats.objects.filter(user_id=instance.author_id).update(
+        followers_count=F('followers_count') + 1)
+    UserStats.objects.filter(user_id=instance.user_id).update(
+        following_count=F('following_count') + 1)
+    timeline.backfill(instance.user_id, instance.author_id)
+    follows.forget_follows(instance.user_id)
+    if UserStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT + 1
+    ).exists():
+        timeline.pause_fan_out(instance.author_id, instance.pk)
+
+
+@receiver(pre_delete, sender=Follow)
+def claim_deleted_follow(sender, instance, using, **kwargs):
+    # Две одновременные отписки удаляют одну строку, а post_delete
+    # приходит обеим. Строку удаляем сразу, без сигналов: DELETE затронет
+    # её только у одной из отписок, и счётчики уменьшит только она.
+    # Удаление самого Collector после этого ничего не найдёт
+    instance.counted = Follow.objects.using(using).filter(
+        pk=instance.pk)._raw_delete(using) > 0
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    if instance.user_id is None or instance.author_id is None:
+        return
+    if not getattr(instance, 'counted', True):
+        return
+    UserStats.objects.filter(
+        user_id=instance.author_id, followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+    UserStats.objects.filter(
+        user_id=instance.user_id, following_count__gt=0
+    ).update(following_count=F('following_count') - 1)
+    timeline.prune(instance.user_id, instance.author_id)
+    follows.forget_follows(instance.user_id)
+    # Автор опустился до порога: посты, опубликованные пока он был выше,
+    # в ленты не попали, а читать их отдельно лента перестанет. Дополнение
+    # идёт в фоне, а не в запросе отписавшегося
+    if UserStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists():
+        timeline.schedule_refill(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1)
+
+
+def bump_feed_generation(sender, **kwargs):
+    caching.bump_generation()
+
+
+for model in (Post, Group, Comment):
+    post_save.connect(bump_feed_generation, sender=model)
+    post_delete.connect(bump_feed_generation, sender=model)
+
+
+def install_search_index(sender, using, **kwargs):
+    search.install(connections[using], repair_only=True)
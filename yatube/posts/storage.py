@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+# posts/ab/cd/abcd…(sha256).jpg
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+# Сколько живёт метка сохранённого файла, если запись о нём так и не
+# зафиксировали
+CLAIM_TIMEOUT = 60
+
+
+def claim_key(name):
+    return f'media.claimed.{name}'
+
+
+def unclaim_on_commit(name):
+    """Снимает метку, когда запись со ссылкой на файл зафиксирована."""
+    if name and is_content_addressed(name):
+        transaction.on_commit(lambda: cache.delete(claim_key(name)))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под sha256 от содержимого в шардированных папках.
+
+    Одинаковые картинки ложатся в один файл, поэтому не занимают лишнего
+    места, а миниатюры для них строятся один раз. Удалять такой файл
+    можно, только когда на него не ссылается ни одна запись, —
+    см. posts.signals.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        # Метка ставится до проверки: так release не удалит файл, который
+        # загрузка уже застала на месте, но ещё не успела на него сослаться
+        cache.set(claim_key(name), True, CLAIM_TIMEOUT)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def release(self, name, in_use):
+        """Удаляет файл, если in_use() ложно и файл не сохраняют заново.
+
+        Пока на файл ссылается запись, его не трогаем. Иначе он убирается
+        в сторону и метка проверяется ещё раз: загрузка, заставшая файл
+        на месте, оставила её раньше, и файл вернётся, а опоздавшая
+        запишет его сама. Метки живут в общем кэше воркеров.
+        """
+        if self.is_claimed(name) or in_use():
+            return
+        path = self.path(name)
+        released = f'{path}.released'
+        try:
+            os.replace(path, released)
+        except FileNotFoundError:
+            return
+        if self.is_claimed(name):
+            os.replace(released, path)
+        else:
+            os.remove(released)
+
+    def is_claimed(self, name):
+        return bool(cache.get(claim_key(name)))
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,15 @@
+from django import template
+
+from ..follows import followed_authors as load_followed_authors
+
+register = template.Library()
+
+
+@register.filter
+def followed_authors(objects, request):
+    """Набор id авторов из objects, на которых подписан зритель.
+
+    {% with followed=page_obj|followed_authors:request %} один раз на
+    страницу, затем {% if post.author_id in followed %}.
+    """
+    return load_followed_authors(request, objects)
@@ -0,0 +1,26 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, radius=2, ends=1):
+    """Номера страниц около текущей и по краям, None на месте пропуска.
+
+    Длина списка не зависит от числа страниц: не больше
+    2 * radius + 2 * ends + 3 элементов.
+    """
+    last = page_obj.paginator.num_pages
+    shown = set(range(1, min(ends, last) + 1))
+    shown.update(range(max(last - ends + 1, 1), last + 1))
+    shown.update(range(max(page_obj.number - radius, 1),
+                       min(page_obj.number + radius, last) + 1))
+    window = []
+    for number in sorted(shown):
+        if window and number - window[-1] == 2:
+            # Пропуск в одну страницу короче показать номером
+            window.append(number - 1)
+        elif window and number - window[-1] > 2:
+            window.append(None)
+        window.append(number)
+    return window
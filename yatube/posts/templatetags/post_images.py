@@ -0,0 +1,27 @@
+from collections import defaultdict
+
+from django import template
+
+register = template.Library()
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """<picture> с srcset по вариантам картинки и запасным <img>."""
+    srcsets = defaultdict(list)
+    variants = sorted(post.image_variants.all(), key=lambda v: v.width)
+    for variant in variants:
+        srcsets[variant.format].append(f'{variant.file.url} {variant.width}w')
+    fallback = srcsets.pop('jpeg', None)
+    sources = [
+        {'type': MIME_TYPES.get(name, f'image/{name}'),
+         'srcset': ', '.join(urls)}
+        for name, urls in srcsets.items()
+    ]
+    return {
+        'src': post.thumbnail_url or post.image.url,
+        'srcset': ', '.join(fallback) if fallback else '',
+        'sources': sources,
+    }
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            slug='group_test_slug',
+            title='Заголовок',
+            description='Описание'
+        )
+        for number in range(settings.POSTS_IN_PAGE + 3):
+            Post.objects.create(text=f'Пост {number}', author=cls.author,
+                                group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_are_paged_by_cursor(self):
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']),
+                                 settings.POSTS_IN_PAGE)
+                self.assertEqual(first['results'][0]['text'], 'Пост 12')
+                self.assertEqual(first['results'][0]['group'],
+                                 self.group.slug)
+                second = self.client.get(url, {'after': first['next']})
+                self.assertEqual(len(second.json()['results']), 3)
+
+    def test_response_is_compact(self):
+        response = self.client.get(reverse('posts:api_index'))
+        content = response.content.decode()
+        self.assertIn('"text":"Пост 12"', content)
+
+    def test_not_modified_until_content_changes(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code, 304)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_feed_requires_login_and_tracks_follows(self):
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.json()['results'], [])
+        etag = response['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']),
+                         settings.POSTS_IN_PAGE)
+
+    def test_post_detail_and_comments(self):
+        post = Post.objects.latest('id')
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.id})
+        response = self.client.get(url)
+        self.assertEqual(response.json()['comments_count'], 0)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Comment.objects.create(text='Комментарий', author=self.user,
+                               post=post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['comments_count'], 1)
+        comments = self.client.get(reverse(
+            'posts:api_post_comments', kwargs={'post_id': post.id})).json()
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+        self.assertEqual(self.client.get(reverse(
+            'posts:api_post_detail', kwargs={'post_id': 0})).status_code, 404)
@@ -0,0 +1,37 @@
+import random
+
+from django.test import TestCase
+
+from ..benchmark import (REQUEST_MIX, Scenario, generate_data, percentile,
+                         regressions, summarize)
+
+
+class BenchmarkTest(TestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_regressions_compare_queries_strictly(self):
+        baseline = {'index': {'queries': 3, 'p95_ms': 10}}
+        self.assertEqual(regressions(
+            {'index': {'queries': 3, 'p95_ms': 14}}, baseline, 1.5), [])
+        self.assertEqual(len(regressions(
+            {'index': {'queries': 4, 'p95_ms': 16}}, baseline, 1.5)), 2)
+
+    def test_latency_compared_only_on_request(self):
+        baseline = {'index': {'queries': 3, 'p95_ms': 10}}
+        slow = {'index': {'queries': 3, 'p95_ms': 100}}
+        self.assertEqual(regressions(slow, baseline), [])
+        self.assertEqual(len(regressions(slow, baseline, 1.5)), 1)
+
+    def test_scenario_covers_request_mix(self):
+        rng = random.Random(0)
+        generate_data(rng, users=5, groups=2, posts=20, follows=6,
+                      comments=10)
+        samples, elapsed = Scenario(rng).run(200)
+        summary = summarize(samples)
+        self.assertEqual(set(summary), {name for name, _ in REQUEST_MIX})
+        self.assertEqual(
+            sum(row['requests'] for row in summary.values()), 200)
@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..caching import (acquire_rebuild_lock, bump_generation,
+                       get_generation, rebuild_lock_key,
+                       release_rebuild_lock)
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+FILE_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': TEMP_CACHE_DIR,
+    }
+}
+
+
+def start_worker(code):
+    """Отдельный процесс Django с тем же файловым кэшем, как у воркера."""
+    env = dict(os.environ,
+               DJANGO_SETTINGS_MODULE='yatube.settings',
+               YATUBE_CACHE='file',
+               YATUBE_CACHE_LOCATION=TEMP_CACHE_DIR)
+    return subprocess.Popen(
+        [sys.executable, '-c',
+         f'import django; django.setup(); {code}'],
+        cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.PIPE, universal_newlines=True)
+
+
+@override_settings(CACHES=FILE_CACHE)
+class SharedCacheTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generation_bump_is_seen_by_other_workers(self):
+        generation = get_generation()
+        worker = start_worker(
+            'from posts.caching import bump_generation; bump_generation()')
+        worker.communicate()
+        self.assertEqual(get_generation(), generation + 1)
+
+    def test_only_one_worker_rebuilds_a_page(self):
+        results = []
+        for _ in range(3):
+            worker = start_worker(
+                'from posts.caching import acquire_rebuild_lock; '
+                'print(acquire_rebuild_lock("feed.1.index"))')
+            results.append(worker.communicate()[0].strip())
+        self.assertEqual(results, ['True', 'False', 'False'])
+        self.assertFalse(acquire_rebuild_lock('feed.1.index'))
+
+
+class StampedeProtectionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_page_is_served_while_rebuilding(self):
+        Post.objects.create(text='Старый пост', author=self.user)
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(text='Новый пост', author=self.user)
+        # Другой воркер уже пересобирает страницу нового поколения
+        acquire_rebuild_lock(
+            rebuild_lock_key(get_generation(), 'http://testserver/'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Старый пост')
+        self.assertNotContains(response, 'Новый пост')
+        self.assertIn('no-store', response['Cache-Control'])
+        # Валидаторы прошлой копии не подтверждают текущую страницу
+        release_rebuild_lock(
+            rebuild_lock_key(get_generation(), 'http://testserver/'))
+        response = self.client.get(
+            reverse('posts:index'),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+        bump_generation()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+
+    def test_clients_revalidate_cached_page(self):
+        for _ in range(2):
+            response = self.client.get(reverse('posts:index'))
+            self.assertIn('max-age=0', response['Cache-Control'])
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertFalse(response.has_header('Expires'))
+        etag = response['ETag']
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
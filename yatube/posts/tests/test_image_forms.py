@@ -1,16 +1,37 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from threading import Thread
 
+from .. import background
 from ..forms import PostForm
-from ..models import Post, User, Group
+from ..models import Post, PostImageVariant, User, Group
+from ..templatetags.post_images import post_picture
+from ..thumbnails import variant_formats
+from ..uploadhandlers import SizeLimitedUploadHandler
+from core.views import serve_media
 from django.conf import settings
 from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.files.uploadhandler import SkipFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
 from django.urls import reverse
+from PIL import Image
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -32,14 +53,7 @@ class ImagePostFormTests(TestCase):
             image=f'posts/{cls.image_name}'
         )
         cls.form = PostForm()
-        cls.small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
+        cls.small_gif = SMALL_GIF
         cls.uploaded = SimpleUploadedFile(
             name=cls.image_name,
             content=cls.small_gif,
@@ -75,8 +89,9 @@ class ImagePostFormTests(TestCase):
         self.assertEqual(last_post.text, ImagePostFormTests.form_data['text'])
         self.assertEqual(last_post.group.pk,
                          ImagePostFormTests.form_data['group'])
-        self.assertEqual(last_post.image,
-                         f'posts/{ImagePostFormTests.image_name}')
+        # Файл назван по хэшу содержимого
+        self.assertRegex(last_post.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
 
     def test_index_correct_posts(self):
         cache.clear()
@@ -121,3 +136,306 @@ class ImagePostFormTests(TestCase):
         self.assertEqual(post.id, ImagePostFormTests.post.id)
         self.assertEqual(post.image,
                          f'posts/{ImagePostFormTests.image_name}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name,
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+
+    def test_thumbnail_is_prepared_after_create_and_edit(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': self.upload('first.gif')},
+        )
+        post = Post.objects.latest('id')
+        self.assertTrue(post.thumbnail_url.startswith(settings.MEDIA_URL))
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, post.thumbnail_url)
+        first_thumbnail = post.thumbnail_url
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Текст', 'image': make_jpeg((20, 10))},
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail_url, first_thumbnail)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, post.thumbnail_url)
+
+    def test_background_errors_are_logged(self):
+        def broken_job(post_id):
+            raise ValueError(post_id)
+
+        # В своём потоке, как в пуле: _run закрывает соединения потока
+        worker = Thread(target=background._run, args=(broken_job, (1,)))
+        with self.assertLogs('posts.background', 'ERROR') as logs:
+            worker.start()
+            worker.join()
+        self.assertIn('broken_job', logs.output[0])
+
+    def test_generate_thumbnails_command_fills_missing(self):
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=self.upload('third.gif'))
+        self.assertEqual(post.thumbnail_url, '')
+        call_command('generate_thumbnails', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail_url, '')
+
+    def test_variants_are_generated_with_sizes(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': self.upload('fourth.gif')},
+        )
+        post = Post.objects.latest('id')
+        variants = post.image_variants.all()
+        self.assertEqual(
+            len(variants),
+            len(settings.IMAGE_VARIANT_WIDTHS) * len(variant_formats()))
+        for variant in variants:
+            with self.subTest(variant=str(variant)):
+                self.assertEqual(variant.size, variant.file.size)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f'{variants[0].file.url} '
+                                      f'{variants[0].width}w')
+
+    @override_settings(BACKGROUND_ASYNC=True)
+    def test_replaced_image_drops_old_variants_at_once(self):
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=self.upload('sixth.gif'))
+        PostImageVariant.objects.create(
+            post=post, width=480, format='jpeg', size=1,
+            file='posts/variants/old_480.jpeg')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Текст', 'image': make_jpeg((20, 10))},
+        )
+        # Фоновая задача ещё не запускалась
+        self.assertFalse(post.image_variants.exists())
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertNotContains(response, 'old_480.jpeg')
+
+    def test_picture_lists_modern_formats_first(self):
+        post = Post.objects.create(
+            text='Текст', author=self.user, image='posts/fifth.gif')
+        for width in (960, 480):
+            for name in ('webp', 'jpeg'):
+                PostImageVariant.objects.create(
+                    post=post, width=width, format=name, size=1,
+                    file=f'posts/variants/{post.pk}_{width}.{name}')
+        context = post_picture(post)
+        self.assertEqual(context['sources'], [{
+            'type': 'image/webp',
+            'srcset': (f'{settings.MEDIA_URL}posts/variants/{post.pk}_480.webp'
+                       f' 480w, {settings.MEDIA_URL}posts/variants/'
+                       f'{post.pk}_960.webp 960w'),
+        }])
+        self.assertIn('_480.jpeg 480w', context['srcset'])
+        self.assertEqual(context['src'], post.image.url)
+
+
+def make_jpeg(size, exif=None, color='red'):
+    buffer = BytesIO()
+    options = {'exif': exif} if exif else {}
+    Image.new('RGB', size, color).save(buffer, 'JPEG', **options)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        response = self.create(make_jpeg((20, 10), exif=b'\0' * 2048))
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(
+            response.context['form'].has_error('image', 'file_too_large'))
+
+    @override_settings(POST_IMAGE_MAX_SIZE=1024)
+    def test_upload_handler_skips_oversized_file(self):
+        request = RequestFactory().post('/')
+        request.oversized_files = set()
+        handler = SizeLimitedUploadHandler(request)
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', 2048)
+        self.addCleanup(handler.file.close)
+        handler.receive_data_chunk(b'\0' * 1024, 0)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'\0', 1024)
+        self.assertEqual(request.oversized_files, {'image'})
+
+    def test_post_form_still_checks_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:post_create'),
+                               data={'text': 'Текст'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected_by_header(self):
+        response = self.create(make_jpeg((20, 10)))
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(
+            response.context['form'].has_error('image', 'too_many_pixels'))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=40)
+    def test_large_image_downsampled_and_metadata_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        self.create(make_jpeg((200, 100), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (40, 20))
+            self.assertNotIn('exif', image.info)
+
+    def test_png_metadata_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        exif[0x8825] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+        buffer = BytesIO()
+        Image.new('P', (20, 10)).save(
+            buffer, 'PNG', exif=exif.tobytes(), transparency=0)
+        self.create(SimpleUploadedFile('picture.png', buffer.getvalue(),
+                                       content_type='image/png'))
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertEqual(image.info['transparency'], 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TransactionTestCase):
+    # Файлы удаляются после фиксации транзакции, поэтому без TestCase
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': image},
+        )
+        return Post.objects.latest('id')
+
+    def variant_names(self, post):
+        return sorted(post.image_variants.values_list('file', flat=True))
+
+    def test_duplicate_upload_reuses_file_and_variants(self):
+        first = self.create(make_jpeg((30, 20), color='blue'))
+        second = self.create(make_jpeg((30, 20), color='blue'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.variant_names(first),
+                         self.variant_names(second))
+        self.assertTrue(self.variant_names(second))
+
+    def test_file_removed_with_last_reference(self):
+        first = self.create(make_jpeg((30, 20), color='green'))
+        second = self.create(make_jpeg((30, 20), color='green'))
+        storage = first.image.storage
+        names = [first.image.name] + self.variant_names(first)
+        first.delete()
+        for name in names:
+            self.assertTrue(storage.exists(name), name)
+        second.delete()
+        for name in names:
+            self.assertFalse(storage.exists(name), name)
+
+    def test_replaced_image_is_released(self):
+        post = self.create(make_jpeg((30, 20), color='yellow'))
+        old_name = post.image.name
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Текст', 'image': make_jpeg((30, 20), color='red')},
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+
+    def test_file_kept_when_delete_rolls_back(self):
+        post = self.create(make_jpeg((30, 20), color='purple'))
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Post.objects.filter(pk=post.pk).delete()
+                raise RuntimeError
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        self.assertTrue(post.image.storage.exists(post.image.name))
+
+    def test_file_kept_for_upload_in_progress(self):
+        post = self.create(make_jpeg((30, 20), color='orange'))
+        storage = post.image.storage
+        with storage.open(post.image.name) as file:
+            content = ContentFile(file.read())
+        # Загрузка того же файла уже нашла его, но запись ещё не создала
+        self.assertEqual(storage.save('posts/upload.jpg', content),
+                         post.image.name)
+        post.delete()
+        self.assertTrue(storage.exists(post.image.name))
+
+    def test_referenced_file_stays_in_place_on_release(self):
+        post = self.create(make_jpeg((30, 20), color='black'))
+        storage = post.image.storage
+        cache.clear()
+        # Пока есть ссылка, другие посты не должны ловить 404
+        storage.release(post.image.name,
+                        lambda: storage.exists(post.image.name))
+        self.assertTrue(storage.exists(post.image.name))
+
+    def test_hashed_media_is_served_as_immutable(self):
+        post = self.create(make_jpeg((30, 20), color='white'))
+        request = RequestFactory().get(post.image.url)
+        response = serve_media(request, post.image.name,
+                               document_root=TEMP_MEDIA_ROOT)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+
+from ..models import Post
+from .test_image_forms import make_jpeg
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        Post.objects.create(text='Текст', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r'templates;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_cache_hits_and_misses_are_counted(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertRegex(response['Server-Timing'],
+                         r'cache;desc="[1-9]\d* hits')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_aggregates_by_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"} 2', text)
+        self.assertIn('yatube_sql_queries_total{view="posts:index"}', text)
+
+    def test_metric_families_are_rendered_as_blocks(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile',
+                                kwargs={'username': self.user}))
+        names = []
+        for line in registry.render().splitlines():
+            if line.startswith('# TYPE '):
+                names.append(line.split()[2])
+                continue
+            family = names[-1]
+            self.assertTrue(line.startswith(family), line)
+            if family.endswith('_total'):
+                self.assertEqual(line.split('{')[0], family)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn('# TYPE yatube_sql_queries_total counter',
+                      registry.render())
+
+    def test_staff_can_read_metrics(self):
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_closed_for_outsiders(self):
+        for headers in ({}, {'REMOTE_ADDR': '127.0.0.1'},
+                        {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(reverse('metrics'), **headers)
+                self.assertEqual(response.status_code, 403)
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST=0)
+    def test_slow_request_logged_with_queries(self):
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_thumbnail_work_is_counted(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': make_jpeg((30, 20))})
+        self.assertRegex(response['Server-Timing'], r'thumbnails;dur=')
+        self.assertIn(
+            'yatube_thumbnail_jobs_total{view="posts:post_create"} 1',
+            registry.render())
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post, UserStats, posts_count
 
 User = get_user_model()
 
@@ -30,3 +33,39 @@ class PostModelTest(TestCase):
             test_str, expected_value = value
             with self.subTest(field=field):
                 self.assertEqual(expected_value[:15], str(test_str))
+
+
+class UserStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+
+    def test_posts_count_follows_create_and_delete(self):
+        self.assertEqual(posts_count(self.user), 0)
+        posts = [Post.objects.create(author=self.user, text='Текст')
+                 for _ in range(3)]
+        self.user.refresh_from_db()
+        self.assertEqual(posts_count(self.user), 3)
+        posts[0].text = 'Новый текст'
+        posts[0].save()
+        posts[1].delete()
+        self.user.refresh_from_db()
+        self.assertEqual(posts_count(self.user), 2)
+
+    def test_recount_stats_fixes_drift(self):
+        Post.objects.create(author=self.user, text='Текст')
+        UserStats.objects.filter(user=self.user).update(posts_count=10)
+        out = StringIO()
+        call_command('recount_stats', stdout=out)
+        self.assertIn('auth: 10 -> 1', out.getvalue())
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+
+    def test_recount_stats_fixes_follow_counters(self):
+        author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=self.user, author=author)
+        UserStats.objects.filter(user=author).update(followers_count=5)
+        UserStats.objects.filter(user=self.user).update(following_count=0)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=author).followers_count,
+                         1)
+        self.assertEqual(UserStats.objects.get(user=self.user).following_count,
+                         1)
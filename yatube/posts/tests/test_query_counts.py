@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FEED_SIZES = (1, 10, 100)
+
+
+class FeedQueryCountTests(TestCase):
+    """Число запросов страницы не зависит от количества постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            slug='group_test_slug',
+            title='Заголовок',
+            description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def fill(self, size):
+        """Добиваем базу до size постов и комментариев к первому посту."""
+        while Post.objects.count() < size:
+            Post.objects.create(
+                text='Тестовый текст', author=self.author, group=self.group)
+        post = Post.objects.order_by('id').first()
+        while post.comments.count() < size:
+            commenter = User.objects.create_user(
+                username=f'user_{post.comments.count()}')
+            Comment.objects.create(
+                text='Комментарий', author=commenter, post=post)
+        return post
+
+    def assert_queries_per_size(self, expected, url_for):
+        for size in FEED_SIZES:
+            post = self.fill(size)
+            url = url_for(post)
+            with self.subTest(url=url, size=size):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    self.authorized_client.get(url)
+
+    def test_index(self):
+        # сессия, пользователь, посты, варианты картинок
+        self.assert_queries_per_size(
+            4, lambda post: reverse('posts:index'))
+
+    def test_group_list(self):
+        # сессия, пользователь, группа, посты, варианты картинок
+        self.assert_queries_per_size(
+            5, lambda post: reverse('posts:group_list',
+                                    kwargs={'slug': self.group.slug}))
+
+    def test_profile(self):
+        # сессия, пользователь, автор со счётчиками и подпиской (общий
+        # для ETag и представления), посты, варианты картинок
+        self.assert_queries_per_size(
+            5, lambda post: reverse('posts:profile',
+                                    kwargs={'username': self.author}))
+
+    def test_follow_index(self):
+        # сессия, пользователь, подписки для ETag, лента, варианты
+        # картинок, авторы вне ленты
+        self.assert_queries_per_size(
+            6, lambda post: reverse('posts:follow_index'))
+
+    def test_post_detail(self):
+        # сессия, пользователь, версия поста для ETag, пост с автором
+        # и счётчиком, комментарии
+        self.assert_queries_per_size(
+            5, lambda post: reverse('posts:post_detail',
+                                    kwargs={'post_id': post.id}))
@@ -0,0 +1,92 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import pack_cursor
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?posts_\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            slug='group_test_slug',
+            title='Заголовок',
+            description='Описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(15):
+            post = Post.objects.create(
+                text=f'Тестовый текст {number}',
+                author=cls.author,
+                group=cls.group
+            )
+        cls.post = post
+        cls.comment = Comment.objects.create(
+            text='Комментарий', author=cls.user, post=post)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'posts_' in query['sql']
+        ]
+        self.assertTrue(queries)
+        for sql in queries:
+            plan = self.explain(sql)
+            with self.subTest(url=url, sql=sql):
+                for step in plan:
+                    self.assertNotRegex(step, FULL_SCAN, plan)
+                    self.assertNotIn(TEMP_SORT, step, plan)
+
+    def test_feed_views_use_indexes(self):
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        profile = reverse('posts:profile',
+                          kwargs={'username': self.author.username})
+        for url in (index, group, profile):
+            first_page = self.authorized_client.get(url)
+            cursor = first_page.context['page_obj'].next_cursor
+            self.assert_indexed(url)
+            self.assert_indexed(f'{url}?after={cursor}')
+            self.assert_indexed(f'{url}?page=2')
+
+    def test_post_detail_uses_indexes(self):
+        self.assert_indexed(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = reverse('posts:post_comments',
+                           kwargs={'post_id': self.post.id})
+        cursor = pack_cursor(self.comment.created.isoformat(),
+                             self.comment.pk)
+        self.assert_indexed(comments)
+        self.assert_indexed(f'{comments}?after={cursor}')
+
+    def test_follow_index_uses_indexes(self):
+        self.assert_indexed(reverse('posts:follow_index'))
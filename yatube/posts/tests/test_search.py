@@ -0,0 +1,91 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import matching_ids, search_available
+
+User = get_user_model()
+
+
+@skipUnless(search_available(), 'FTS5 есть только в SQLite')
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'),
+                               {'q': query, **params})
+
+    def found(self, response):
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_by_word_prefix_with_highlight(self):
+        post = Post.objects.create(
+            text='Котики <b>спят</b> на солнце', author=self.user)
+        Post.objects.create(text='Собаки гуляют', author=self.user)
+        response = self.search('КОТИК')
+        self.assertEqual(self.found(response), [post.pk])
+        self.assertContains(response, '<mark>Котики</mark>')
+        self.assertContains(response, '&lt;b&gt;спят&lt;/b&gt;')
+
+    def test_results_use_post_card_without_caching_snippet(self):
+        Post.objects.create(text='Котики спят', author=self.user)
+        response = self.search('котики')
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        self.assertContains(response, '<mark>Котики</mark>')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Котики спят')
+        self.assertNotContains(response, '<mark>')
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.create(text='Старое слово', author=self.user)
+        post.text = 'Новое слово'
+        post.save()
+        self.assertEqual(self.found(self.search('старое')), [])
+        self.assertEqual(self.found(self.search('новое')), [post.pk])
+        post.delete()
+        self.assertEqual(self.found(self.search('новое')), [])
+
+    def test_fts_syntax_is_not_passed_through(self):
+        Post.objects.create(text='Слово', author=self.user)
+        response = self.search('"слово" OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.found(self.search('***')), [])
+
+    def test_results_paginated_by_cursor(self):
+        for number in range(15):
+            Post.objects.create(
+                text='поиск ' * (number % 3 + 1), author=self.user)
+        first = self.search('поиск').context['page_obj']
+        self.assertEqual(len(first), 10)
+        second = self.search(
+            'поиск', after=first.next_cursor).context['page_obj']
+        self.assertEqual(len(second), 5)
+        self.assertIsNone(second.next_cursor)
+        self.assertFalse({post.pk for post in first}
+                         & {post.pk for post in second})
+        back = self.search(
+            'поиск', before=second.previous_cursor).context['page_obj']
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in first])
+
+    def test_matching_ids_used_in_queryset(self):
+        post = Post.objects.create(text='Админка ищет', author=self.user)
+        self.assertQuerysetEqual(
+            Post.objects.filter(pk__in=matching_ids('админка')),
+            [post.pk], transform=lambda found: found.pk)
+
+
+class BenchmarkSearchCommandTest(TestCase):
+    def test_benchmark_compares_both_searches(self):
+        out = StringIO()
+        call_command('benchmark_search', rows=300, repeat=1, stdout=out)
+        self.assertIn('icontains', out.getvalue())
+        self.assertIn('FTS5', out.getvalue())
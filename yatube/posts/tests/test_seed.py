@@ -0,0 +1,56 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+from ..search import matching_ids, search_available
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, **options):
+        call_command('seed', users=20, groups=3, posts=200, follows=60,
+                     comments=300, batch=50, stdout=StringIO(), **options)
+
+    def test_counts_and_denormalized_fields_match(self):
+        self.seed()
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Follow.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')).exists())
+        for stats in UserStats.objects.annotate(
+                posts=Count('user__posts', distinct=True),
+                followers=Count('user__following', distinct=True),
+                following=Count('user__follower', distinct=True)):
+            self.assertEqual(stats.posts_count, stats.posts)
+            self.assertEqual(stats.followers_count, stats.followers)
+            self.assertEqual(stats.following_count, stats.following)
+        for post in Post.objects.annotate(total=Count('comments')):
+            self.assertEqual(post.comments_count, post.total)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=5)
+    def test_timeline_fanout(self):
+        self.seed()
+        expected = sum(
+            Post.objects.filter(author=follow.author).count()
+            for follow in Follow.objects.filter(
+                author__stats__followers_count__lte=5))
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+
+    @skipUnless(search_available(), 'FTS5 есть только в SQLite')
+    def test_search_index_rebuilt(self):
+        self.seed()
+        post = Post.objects.first()
+        word = post.text.split()[0]
+        self.assertIn(post.pk, Post.objects.filter(
+            pk__in=matching_ids(word)).values_list('pk', flat=True))
+
+    def test_same_seed_is_reproducible_and_appends(self):
+        texts = Post.objects.order_by('pk').values_list('text', flat=True)
+        self.seed(seed=1)
+        first = list(texts)
+        self.seed(seed=1)
+        self.assertEqual(list(texts.all()), first * 2)
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import performance_settings
+
+PROD_SETTINGS = '''
+import json
+from django.conf import settings
+from core.checks import performance_settings
+print(json.dumps({
+    'debug': settings.DEBUG,
+    'loaders': settings.TEMPLATES[0]['OPTIONS']['loaders'],
+    'session': settings.SESSION_ENGINE,
+    'warnings': [warning.id for warning in performance_settings(None)],
+}))
+'''
+
+
+def warning_ids():
+    return {warning.id for warning in performance_settings(None)}
+
+
+class PerformanceCheckTest(SimpleTestCase):
+    def test_dev_profile_reads_templates_from_disk(self):
+        self.assertIn('yatube.W002', warning_ids())
+
+    @override_settings(
+        DEBUG=True, SESSION_ENGINE='django.contrib.sessions.backends.db',
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.postgresql', 'CONN_MAX_AGE': 0}})
+    def test_hostile_options_reported(self):
+        self.assertTrue({'yatube.W001', 'yatube.W003', 'yatube.W004',
+                         'yatube.W005'} <= warning_ids())
+
+    def test_prod_profile(self):
+        env = dict(os.environ, YATUBE_ENV='prod', SECRET_KEY='test',
+                   YATUBE_CACHE='file',
+                   DJANGO_SETTINGS_MODULE='yatube.settings')
+        output = subprocess.run(
+            [sys.executable, '-c',
+             'import django; django.setup()\n' + PROD_SETTINGS],
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE, universal_newlines=True).stdout
+        result = json.loads(output)
+        self.assertFalse(result['debug'])
+        self.assertEqual(result['loaders'][0][0],
+                         'django.template.loaders.cached.Loader')
+        self.assertEqual(result['session'],
+                         'django.contrib.sessions.backends.signed_cookies')
+        self.assertEqual(result['warnings'], [])
+
+    def test_prod_profile_requires_shared_cache(self):
+        env = dict(os.environ, YATUBE_ENV='prod', SECRET_KEY='test',
+                   YATUBE_CACHE='locmem',
+                   DJANGO_SETTINGS_MODULE='yatube.settings')
+        result = subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup()'],
+            cwd=settings.BASE_DIR, env=env, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from core.backends import precompile_templates
+
+TEMPLATES_DIR = tempfile.mkdtemp()
+
+
+def templates(loaders):
+    return [{**settings.TEMPLATES[0],
+             'DIRS': [TEMPLATES_DIR] + settings.TEMPLATES[0]['DIRS'],
+             'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'],
+                         'loaders': loaders}}]
+
+
+CACHED = templates([('django.template.loaders.cached.Loader', [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+])])
+
+
+class PrecompileTemplatesTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMPLATES_DIR, ignore_errors=True)
+
+    def write(self, name, source):
+        path = os.path.join(TEMPLATES_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(source)
+        self.addCleanup(os.remove, path)
+
+    def test_project_templates_compile(self):
+        total, errors = precompile_templates()
+        self.assertEqual(errors, [])
+        self.assertGreater(total, 0)
+        out = StringIO()
+        call_command('precompile_templates', stdout=out)
+        self.assertIn('Шаблонов:', out.getvalue())
+
+    @override_settings(TEMPLATES=CACHED)
+    def test_syntax_error_fails_command(self):
+        self.write('broken.html', '{% if %}')
+        with self.assertRaisesMessage(CommandError, 'broken.html'):
+            call_command('precompile_templates', stdout=StringIO())
+
+    @override_settings(TEMPLATES=CACHED)
+    def test_cached_loader_parses_once(self):
+        precompile_templates()
+        engine = engines.all()[0]
+        self.assertIs(engine.get_template('posts/index.html').template,
+                      engine.get_template('posts/index.html').template)
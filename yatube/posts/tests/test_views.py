@@ -1,11 +1,22 @@
+from threading import Thread
+
 from django.core.cache import cache
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, connections
+from django.db.models.signals import pre_delete
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
 from django.urls import reverse
 from django import forms
 
-from ..models import Post, Group
+from ..models import (Comment, Follow, Post, Group, TimelineEntry,
+                      UserStats)
+from .. import caching, timeline
+from ..follows import followed_authors
+from ..paginators import CachedCountPaginator
+from ..templatetags.pagination import page_window
 
 
 User = get_user_model()
@@ -119,14 +130,25 @@ class PagesTests(TestCase):
     def test_zcache(self):
         cache.clear()
         response = self.client.get(reverse('posts:index'))
-        self.post.delete()
-        response_after_delete = self.client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_after_delete.content)
+        # Правка в обход сигналов не меняет поколение — страница из кэша
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        response_cached = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_cached.content)
         cache.clear()
         response_after_clear_cache = self.client.get(reverse('posts:index'))
         self.assertNotEqual(response.content,
                             response_after_clear_cache.content)
 
+    def test_index_cache_invalidated_by_changes(self):
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        new_post = Post.objects.create(text='Свежий пост', author=self.user)
+        response_after_create = self.client.get(reverse('posts:index'))
+        self.assertContains(response_after_create, 'Свежий пост')
+        new_post.delete()
+        response_after_delete = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_after_delete.content)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -190,6 +212,81 @@ class PaginatorViewsTest(TestCase):
                          PaginatorViewsTest.second_page_posts)
 
 
+class NumberedPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        for number in range(settings.POSTS_IN_PAGE * 12):
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def profile_page(self, number):
+        return self.client.get(
+            reverse('posts:profile', args=[self.user.username]),
+            {'page': number})
+
+    def test_count_cached_until_content_changes(self):
+        self.profile_page(2)
+        with self.assertNumQueries(3):
+            self.profile_page(3)
+        Post.objects.create(text='Новый пост', author=self.user)
+        with self.assertNumQueries(4):
+            self.profile_page(3)
+
+    def test_page_window_renders_nearby_pages_only(self):
+        response = self.profile_page(6)
+        self.assertEqual(
+            page_window(response.context['page_obj']),
+            [1, None, 4, 5, 6, 7, 8, None, 12])
+        self.assertContains(response, 'page=8')
+        self.assertNotContains(response, 'page=10"')
+
+    def test_page_window_fills_single_gaps(self):
+        page_obj = CachedCountPaginator(
+            Post.objects.order_by('-id'), 10).page(4)
+        self.assertEqual(page_window(page_obj),
+                         [1, 2, 3, 4, 5, 6, None, 12])
+
+    @override_settings(PAGINATOR_ESTIMATE_ABOVE=0)
+    def test_whole_table_count_estimated_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = CachedCountPaginator(Post.objects.order_by('-id'), 10)
+        self.assertEqual(paginator.count, Post.objects.count())
+        self.assertTrue(paginator.approximate)
+        filtered = CachedCountPaginator(
+            Post.objects.filter(author=self.user).order_by('-id'), 10)
+        self.assertEqual(filtered.count, Post.objects.count())
+        self.assertFalse(filtered.approximate)
+
+    def test_follow_page_survives_unfollow(self):
+        reader = User.objects.create_user(username='Reader')
+        client = Client()
+        client.force_login(reader)
+        client.get(reverse('posts:profile_follow', args=[self.user.username]))
+        url = reverse('posts:follow_index')
+        self.assertEqual(
+            client.get(url, {'page': 3}).context['page_obj'].number, 3)
+        client.get(
+            reverse('posts:profile_unfollow', args=[self.user.username]))
+        response = client.get(url, {'page': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_overestimated_count_clamped_to_last_page(self):
+        paginator = CachedCountPaginator(
+            Post.objects.order_by('-id'), settings.POSTS_IN_PAGE)
+        paginator.count = Post.objects.count() * 2
+        page_obj = paginator.get_page(20)
+        self.assertEqual(page_obj.number, 12)
+        self.assertEqual(len(page_obj), settings.POSTS_IN_PAGE)
+        self.assertFalse(page_obj.has_next())
+
+
 class PostCreateTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -240,3 +337,514 @@ class PostCreateTest(TestCase):
         first_post = response.context.get('page_obj').object_list[0]
         self.assertEqual(first_post.text, PostCreateTest.sample_text)
         self.assertEqual(first_post.id, PostCreateTest.post.id)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.posts_count = settings.POSTS_IN_PAGE * 2 + 3
+        for post in range(cls.posts_count):
+            Post.objects.create(
+                text=f'Тестовый текст {post}',
+                author=cls.user,
+            )
+        cls.url = reverse('posts:profile',
+                          kwargs={'username': cls.user.username})
+
+    def get_page(self, query=''):
+        return self.client.get(self.url + query).context['page_obj']
+
+    def test_cursor_walks_through_all_posts(self):
+        seen = []
+        page_obj = self.get_page()
+        self.assertIsNone(page_obj.previous_cursor)
+        while True:
+            seen.extend(post.id for post in page_obj)
+            if not page_obj.next_cursor:
+                break
+            page_obj = self.get_page(f'?after={page_obj.next_cursor}')
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_before_cursor_returns_previous_page(self):
+        first_page = self.get_page()
+        second_page = self.get_page(f'?after={first_page.next_cursor}')
+        self.assertTrue(second_page.has_previous())
+        back = self.get_page(f'?before={second_page.previous_cursor}')
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first_page])
+        self.assertIsNone(back.previous_cursor)
+
+    def test_legacy_page_link_gets_cursors(self):
+        page_obj = self.get_page('?page=3')
+        self.assertEqual(len(page_obj), 3)
+        self.assertIsNone(page_obj.next_cursor)
+        previous = self.get_page(f'?before={page_obj.previous_cursor}')
+        self.assertEqual([post.id for post in previous],
+                         [post.id for post in self.get_page('?page=2')])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        page_obj = self.get_page('?after=не-курсор')
+        self.assertEqual([post.id for post in page_obj],
+                         [post.id for post in self.get_page()])
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        for number in range(3):
+            Post.objects.create(text=f'Старый пост {number}',
+                                author=cls.author)
+        Post.objects.create(text='Чужой пост', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Reader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed_ids(self, query=''):
+        response = self.authorized_client.get(
+            reverse('posts:follow_index') + query)
+        return [post.id for post in response.context['page_obj']]
+
+    def expected_ids(self):
+        return list(Post.objects.filter(
+            author__following__user=self.user
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'}))
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(),
+                         3)
+        Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Ещё чужой пост', author=self.other)
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.assertEqual(len(self.feed_ids()), 4)
+
+    def test_unfollow_prunes_timeline(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Author'}))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_authors_are_read_on_request(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other)
+        for number in range(settings.POSTS_IN_PAGE):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        first_page = self.feed_ids()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertEqual(first_page + self.feed_ids(f'?after={cursor}'),
+                         self.expected_ids())
+
+    def cross_fanout_limit(self):
+        # Третий подписчик поднимает автора выше порога 2, пока он выше,
+        # выходит пост, затем второй отписывается
+        second = User.objects.create_user(username='Second')
+        self.third = User.objects.create_user(username='Third')
+        for user in (self.user, second, self.third):
+            Follow.objects.create(user=user, author=self.author)
+        Post.objects.create(text='Пост выше порога', author=self.author)
+        client = Client()
+        client.force_login(second)
+        client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Author'}))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, BACKGROUND_ASYNC=False)
+    def test_refill_adds_what_was_skipped_above_limit(self):
+        self.cross_fanout_limit()
+        for user in (self.user, self.third):
+            with self.subTest(user=user.username):
+                self.assertEqual(
+                    TimelineEntry.objects.filter(user=user).count(), 4)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, BACKGROUND_ASYNC=True)
+    def test_refill_runs_outside_unfollow_request(self):
+        self.cross_fanout_limit()
+        # Фоновая задача запускается только после фиксации транзакции
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.third).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, BACKGROUND_ASYNC=True)
+    def test_refill_changes_follow_page_etag(self):
+        self.cross_fanout_limit()
+        client = Client()
+        client.force_login(self.third)
+        url = reverse('posts:follow_index')
+        response = client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        timeline.refill_followers(self.author.pk)
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            slug='group_test_slug',
+            title='Заголовок',
+            description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Исходный текст', author=self.user, group=self.group)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:group_list',
+                           kwargs={'slug': self.group.slug})
+
+    def test_card_is_reused_until_post_changes(self):
+        self.client.get(self.url)
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Исходный текст')
+        self.assertNotContains(response, 'Тихая правка')
+
+    def test_post_edit_invalidates_card(self):
+        self.client.get(self.url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.group.id},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Новый текст')
+
+    def test_card_follows_author_and_group_changes(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        User.objects.filter(pk=self.user.pk).update(
+            username='Renamed', first_name='Новое')
+        Group.objects.filter(pk=self.group.pk).update(slug='renamed_slug')
+        caching.bump_generation()
+        response = self.client.get(url)
+        self.assertContains(response, 'Новое')
+        self.assertContains(
+            response, reverse('posts:profile', args=['Renamed']))
+        self.assertContains(
+            response, reverse('posts:group_list', args=['renamed_slug']))
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {number}', author=cls.user,
+                    post=cls.post)
+            for number in range(settings.COMMENTS_IN_PAGE + 5))
+
+    def test_post_detail_shows_first_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_IN_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_load_more_returns_next_page(self):
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': first.next_cursor})
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Комментарий {number}' for number in range(
+                settings.COMMENTS_IN_PAGE, settings.COMMENTS_IN_PAGE + 5)])
+        self.assertIsNone(data['next_cursor'])
+        self.assertIn('Комментарий 24', data['html'])
+
+    def test_comments_count_follows_changes(self):
+        post = Post.objects.create(text='Другой пост', author=self.user)
+        comment = Comment.objects.create(
+            text='Первый', author=self.user, post=post)
+        Comment.objects.create(text='Второй', author=self.user, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class ConditionalResponseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            slug='group_test_slug',
+            title='Заголовок',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assert_revalidates(self, client, url, change):
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+        change()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feeds_revalidate_on_new_post(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_revalidates(
+                    self.client, url, lambda: Post.objects.create(
+                        text='Новый', author=self.author, group=self.group))
+
+    def test_feed_etag_depends_on_viewer(self):
+        url = reverse('posts:index')
+        self.assertNotEqual(self.client.get(url)['ETag'],
+                            self.authorized_client.get(url)['ETag'])
+
+    def test_profile_revalidates_on_follow(self):
+        self.assert_revalidates(
+            self.authorized_client,
+            reverse('posts:profile', kwargs={'username': self.author}),
+            lambda: Follow.objects.create(user=self.user, author=self.author))
+
+    def test_follow_index_revalidates_on_follow(self):
+        self.assert_revalidates(
+            self.authorized_client, reverse('posts:follow_index'),
+            lambda: Follow.objects.create(user=self.user, author=self.author))
+
+    def test_post_detail_revalidates_on_comment(self):
+        self.assert_revalidates(
+            self.authorized_client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            lambda: Comment.objects.create(
+                text='Комментарий', author=self.user, post=self.post))
+
+    def test_post_detail_revalidates_on_author_post(self):
+        self.assert_revalidates(
+            self.client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            lambda: Post.objects.create(text='Ещё', author=self.author))
+
+    def test_anonymous_profile_revalidates_on_new_follower(self):
+        self.assert_revalidates(
+            self.client,
+            reverse('posts:profile', kwargs={'username': self.author}),
+            lambda: Follow.objects.create(user=self.user, author=self.author))
+
+
+class FollowCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.readers = [User.objects.create_user(username=f'reader{number}')
+                       for number in range(25)]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.readers[0])
+
+    def counts(self, user):
+        stats = UserStats.objects.get(user=user)
+        return stats.followers_count, stats.following_count
+
+    def test_counters_follow_views(self):
+        url = reverse('posts:profile_follow', args=[self.author.username])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.counts(self.author), (1, 0))
+        self.assertEqual(self.counts(self.readers[0]), (0, 1))
+        url = reverse('posts:profile_unfollow', args=[self.author.username])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.counts(self.author), (0, 0))
+        self.assertEqual(self.counts(self.readers[0]), (0, 0))
+
+    def test_racing_unfollows_decrement_once(self):
+        Follow.objects.create(user=self.readers[0], author=self.author)
+        Follow.objects.create(user=self.readers[1], author=self.author)
+        # Оба запроса успели прочитать подписку до удаления
+        first, second = (Follow.objects.get(user=self.readers[0])
+                         for _ in range(2))
+        first.delete()
+        second.delete()
+        self.assertEqual(self.counts(self.author), (1, 0))
+        self.assertEqual(self.counts(self.readers[0]), (0, 0))
+
+    def test_unfollow_interleaved_before_delete_decrements_once(self):
+        Follow.objects.create(user=self.readers[0], author=self.author)
+        Follow.objects.create(user=self.readers[1], author=self.author)
+        first, second = (Follow.objects.get(user=self.readers[0])
+                         for _ in range(2))
+
+        def interleave(sender, instance, **kwargs):
+            # Вторая отписка успевает целиком, пока первая ещё удаляет
+            if instance is first:
+                pre_delete.disconnect(interleave, sender=Follow)
+                second.delete()
+
+        pre_delete.connect(interleave, sender=Follow)
+        self.addCleanup(pre_delete.disconnect, interleave, sender=Follow)
+        first.delete()
+        self.assertEqual(self.counts(self.author), (1, 0))
+        self.assertEqual(self.counts(self.readers[0]), (0, 0))
+
+    def test_lists_paged_by_cursor_newest_first(self):
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        url = reverse('posts:followers', args=[self.author.username])
+        first = self.client.get(url).context['page_obj']
+        self.assertEqual(len(first), settings.FOLLOWS_IN_PAGE)
+        self.assertEqual(first[0], self.readers[-1])
+        second = self.client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(
+            [user.pk for user in first] + [user.pk for user in second],
+            [user.pk for user in reversed(self.readers)])
+        response = self.client.get(
+            reverse('posts:following', args=[self.readers[3].username]))
+        self.assertEqual(list(response.context['page_obj']), [self.author])
+        self.assertContains(response, 'подписчиков: 25')
+
+    def test_list_query_count_does_not_grow(self):
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        url = reverse('posts:followers', args=[self.author.username])
+        # сессия, пользователь, автор, окно подписок со статистикой и
+        # набор подписок зрителя, который дальше берётся из кэша
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_list_buttons_follow_viewer_state(self):
+        for reader in self.readers[1:4]:
+            Follow.objects.create(user=reader, author=self.author)
+        url = reverse('posts:following', args=[self.readers[1].username])
+        self.assertContains(self.client.get(url), 'Подписаться')
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        response = self.client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Подписаться')
+
+
+class FollowedAuthorsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(5)]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.posts = [Post.objects.create(text='Текст', author=author)
+                     for author in cls.authors]
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.reader
+
+    def expected(self):
+        return {author.pk for author in self.authors[:2]}
+
+    def test_follow_set_cached_between_requests(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(followed_authors(self.request, self.posts),
+                             self.expected())
+        self.request = RequestFactory().get('/')
+        self.request.user = self.reader
+        with self.assertNumQueries(0):
+            self.assertEqual(followed_authors(self.request, self.authors),
+                             self.expected())
+
+    def test_follow_set_forgotten_on_unfollow(self):
+        followed_authors(self.request, self.posts)
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[0]).delete()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.reader
+        self.assertEqual(followed_authors(self.request, self.posts),
+                         {self.authors[1].pk})
+
+    @override_settings(FOLLOW_SET_CACHE_LIMIT=1)
+    def test_large_follow_set_checked_per_page_in_one_query(self):
+        # Набор (2) больше лимита: 1 запрос набора и 1 на всю страницу
+        with self.assertNumQueries(2):
+            self.assertEqual(followed_authors(self.request, self.posts),
+                             self.expected())
+        with self.assertNumQueries(0):
+            followed_authors(self.request, self.posts[:3])
+
+    def test_anonymous_follows_nobody(self):
+        self.request.user = AnonymousUser()
+        with self.assertNumQueries(0):
+            self.assertEqual(followed_authors(self.request, self.posts),
+                             set())
+
+
+class ConcurrentFollowTest(TransactionTestCase):
+    def test_counters_consistent_under_concurrent_toggles(self):
+        author = User.objects.create_user(username='Writer')
+        readers = [User.objects.create_user(username=f'reader{number}')
+                   for number in range(4)]
+
+        def toggle(reader):
+            client = Client()
+            client.force_login(reader)
+            for _ in range(5):
+                for action in ('profile_follow', 'profile_unfollow',
+                               'profile_follow'):
+                    client.get(reverse(f'posts:{action}',
+                                       args=[author.username]))
+            connections.close_all()
+
+        threads = [Thread(target=toggle, args=[reader])
+                   for reader in readers * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(UserStats.objects.get(user=author).followers_count,
+                         Follow.objects.filter(author=author).count())
+        for reader in readers:
+            self.assertEqual(
+                UserStats.objects.get(user=reader).following_count,
+                Follow.objects.filter(user=reader).count())
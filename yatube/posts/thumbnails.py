@@ -0,0 +1,105 @@
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics
+
+from . import caching
+from .background import run_after_commit
+from .models import Post, PostImageVariant
+from .storage import unclaim_on_commit
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+FEED_RATIO = 339 / 960
+VARIANT_QUALITY = 80
+
+
+def variant_formats():
+    """Форматы из настроек, которые установленный Pillow умеет писать."""
+    Image.init()
+    return [name for name in settings.IMAGE_VARIANT_FORMATS
+            if name.upper() in Image.SAVE]
+
+
+def copy_variants(post):
+    """Берёт готовые варианты у другого поста с тем же файлом картинки."""
+    donor = Post.objects.filter(
+        image=post.image.name, image_variants__isnull=False
+    ).exclude(pk=post.pk).values_list('pk', flat=True).first()
+    if donor is None:
+        return False
+    PostImageVariant.objects.bulk_create(
+        PostImageVariant(post=post, width=variant.width,
+                         format=variant.format, file=variant.file.name,
+                         size=variant.size)
+        for variant in PostImageVariant.objects.filter(post_id=donor))
+    return True
+
+
+def generate_variants(post):
+    """Режет картинку под пропорции ленты во всех ширинах и форматах.
+
+    Файлы лежат в хранилище по хэшу, так что старые варианты удаляются
+    сигналом, только когда на них не ссылаются другие посты.
+    """
+    post.image_variants.all().delete()
+    if copy_variants(post):
+        return
+    with post.image.open('rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = original.convert('RGB')
+    variants = []
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        resized = ImageOps.fit(
+            original, (width, round(width * FEED_RATIO)), Image.LANCZOS)
+        for name in variant_formats():
+            buffer = BytesIO()
+            resized.save(buffer, name.upper(), quality=VARIANT_QUALITY)
+            variant = PostImageVariant(
+                post=post, width=width, format=name,
+                size=buffer.tell())
+            variant.file.save(f'{width}.{name}',
+                              ContentFile(buffer.getvalue()), save=False)
+            variants.append(variant)
+    # bulk_create не шлёт post_save, метки файлов снимаем сами
+    PostImageVariant.objects.bulk_create(variants)
+    for variant in variants:
+        unclaim_on_commit(variant.file.name)
+
+
+def prepare_images(post_id):
+    """Готовит миниатюру и варианты картинки и запоминает их в посте."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    try:
+        thumbnail = get_thumbnail(post.image, FEED_GEOMETRY, **FEED_OPTIONS)
+        generate_variants(post)
+    except OSError:
+        logger.exception('Не удалось обработать картинку поста %s', post_id)
+        return
+    # Пока работали, картинку могли заменить — тогда адрес уже не нужен
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=thumbnail.url, version=F('version') + 1)
+    if updated:
+        caching.bump_generation()
+
+
+def schedule_thumbnail(post):
+    if not post.image:
+        return
+    metrics.count('thumbnail_jobs')
+    if not settings.BACKGROUND_ASYNC:
+        with metrics.timer('thumbnails'):
+            prepare_images(post.pk)
+        return
+    run_after_commit(prepare_images, post.pk)
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import caching
+from .background import run_after_commit
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+PAUSE_MARGIN = timedelta(minutes=1)
+
+
+def fans_out_on_write(author_id):
+    """Раскладывать ли посты автора по лентам подписчиков при публикации."""
+    return not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out_on_read_authors(user):
+    """Авторы из подписок, чьи посты лента дочитывает сама."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+
+
+def _insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    if not fans_out_on_write(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    if not fans_out_on_write(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def paused_key(author_id):
+    return f'timeline.paused.{author_id}'
+
+
+def pause_fan_out(author_id, follow_id):
+    """Запоминает, с каких постов и подписок автор перестал раскладываться.
+
+    Если отметка уже есть, остаётся более ранняя. Запас по времени
+    покрывает посты, сохранявшиеся одновременно с подпиской.
+    """
+    cache.add(paused_key(author_id),
+              (timezone.now() - PAUSE_MARGIN, follow_id), timeout=None)
+
+
+def schedule_refill(author_id):
+    if not settings.BACKGROUND_ASYNC:
+        refill_followers(author_id)
+        return
+    run_after_commit(refill_followers, author_id)
+
+
+def refill_followers(author_id):
+    """Автор снова раскладывается при записи: дополняем ленты подписчиков.
+
+    Дополняется только пропущенное с отметки pause_fan_out: посты новее
+    неё у старых подписчиков и все посты у подписавшихся после неё. Без
+    отметки в кэше дополняются все ленты целиком.
+    """
+    if not fans_out_on_write(author_id):
+        return
+    paused = cache.get(paused_key(author_id))
+    cache.delete(paused_key(author_id))
+    since, first_follow = paused if paused is not None else (None, 0)
+    follows = Follow.objects.filter(author_id=author_id)
+    posts = Post.objects.filter(author_id=author_id)
+    for user_id in follows.filter(pk__gte=first_follow).values_list(
+            'user_id', flat=True).iterator():
+        backfill(user_id, author_id)
+    if since is not None:
+        refill_recent(follows.filter(pk__lt=first_follow),
+                      posts.filter(pub_date__gte=since))
+    # Подписки не изменились, так что ETag ленты подписок сменит только
+    # новое поколение
+    caching.bump_generation()
+
+
+def refill_recent(follows, posts):
+    recent = list(posts.values_list('id', 'author_id', 'pub_date'))
+    if not recent:
+        return
+    for user_id in follows.values_list('user_id', flat=True).iterator():
+        _insert(
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, pub_date=pub_date)
+            for post_id, author_id, pub_date in recent
+        )
@@ -0,0 +1,37 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск кусками и бросает файл сверх лимита.
+
+    Такой файл не попадает в request.FILES, а его поле запоминается в
+    request.oversized_files, чтобы форма сообщила об ошибке.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_SIZE:
+            self.request.oversized_files.add(self.field_name)
+            raise SkipFile
+        return super().receive_data_chunk(raw_data, start)
+
+
+def limit_uploads(view):
+    """Разбирает загрузки представления через SizeLimitedUploadHandler.
+
+    CsrfViewMiddleware читает request.POST до представления, поэтому
+    обработчики меняются до проверки CSRF, а сама проверка идёт после.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        request.oversized_files = set()
+        request.upload_handlers = [SizeLimitedUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapped
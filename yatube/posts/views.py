@@ -1,19 +1,28 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition
 
+from .caching import cache_feed_page
+from .conditional import (feed_last_modified, follow_etag, follows_etag,
+                          page_etag, post_detail_etag, profile_etag)
+from .follows import profile_author
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Group, Post, User, Follow, posts_count
+from .paginators import (CommentPaginator, FollowPaginator, TimelinePaginator,
+                         decode_cursor, decode_id_cursor, get_page_obj)
+from .search import SearchPaginator, decode_search_cursor, search_available
+from .thumbnails import schedule_thumbnail
+from .uploadhandlers import limit_uploads
 
 
-@cache_page(20)
+@condition(etag_func=page_etag, last_modified_func=feed_last_modified)
+@cache_feed_page(settings.FEED_CACHE_TIMEOUT)
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
         'index_button': True,
@@ -21,12 +30,11 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=page_etag, last_modified_func=feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed().filter(group=group)
+    page_obj = get_page_obj(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -34,57 +42,99 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=profile_etag, last_modified_func=feed_last_modified)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    total_user_posts = post_list.count()
-    # Если пользователь гость, то запрос с user=request.user крашнется
-    following = False
-    if not request.user.is_anonymous:
-        following = Follow.objects.filter(
-            author=author,
-            user=request.user
-        ).exists()
+    author = profile_author(request, username)
+    if author is None:
+        raise Http404
+    post_list = Post.objects.feed().filter(author=author)
+    page_obj = get_page_obj(request, post_list)
+    total_user_posts = posts_count(author)
     context = {
         'author': author,
         'total_user_posts': total_user_posts,
-        'following': following,
+        'following': author.viewer_follows,
         'page_obj': page_obj,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments_page(request, post):
+    paginator = CommentPaginator(
+        post.comments.select_related('author'), settings.COMMENTS_IN_PAGE)
+    return paginator.cursor_page(
+        after=decode_cursor(request.GET.get('after')),
+        before=decode_cursor(request.GET.get('before')))
+
+
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author = post.author
-    total_user_posts = Post.objects.filter(author=author).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    total_user_posts = posts_count(post.author)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'total_user_posts': total_user_posts,
         'title': post.text[:30],
         'form': form,
-        'comments': post.comments.all(),
+        'comments': get_comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(request, post)
+    html = render_to_string(
+        'posts/includes/comments.html', {'comments': comments}, request)
+    return JsonResponse({
+        'comments': [{
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        } for comment in comments],
+        'html': html,
+        'next_cursor': comments.next_cursor,
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query and search_available():
+        page_obj = SearchPaginator(query, settings.POSTS_IN_PAGE).cursor_page(
+            after=decode_search_cursor(request.GET.get('after')),
+            before=decode_search_cursor(request.GET.get('before')))
+    elif query:
+        page_obj = get_page_obj(
+            request, Post.objects.feed().filter(text__icontains=query))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@limit_uploads
 @login_required
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None)
+        files=request.FILES or None,
+        oversized_files=request.oversized_files)
     if form.is_valid():
         instance = form.save(commit=False)
         instance.author = request.user
         instance.save()
+        schedule_thumbnail(instance)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@limit_uploads
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -93,9 +143,18 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
+        oversized_files=request.oversized_files,
         instance=post)
     if form.is_valid():
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.thumbnail_url = ''
+            # Старые варианты в <picture> браузер предпочёл бы новой
+            # картинке, пока фоновая задача не нарежет новые
+            post.image_variants.all().delete()
         form.save()
+        if image_changed:
+            schedule_thumbnail(post)
         return redirect('posts:post_detail', post_id=post.id)
 
     context = {'is_edit': True, 'form': form, 'post': post}
@@ -115,13 +174,14 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=follow_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(
+    post_list = Post.objects.feed().filter(
         author__following__user=request.user
-    ).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    )
+    page_obj = get_page_obj(
+        request, post_list,
+        TimelinePaginator(request.user, settings.POSTS_IN_PAGE))
     context = {
         'page_obj': page_obj,
         'follow_button': True,
@@ -129,6 +189,35 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def follow_list(request, username, side, title):
+    author = profile_author(request, username)
+    if author is None:
+        raise Http404
+    # Подписчики автора — подписки на него, подписки — его собственные
+    follows = Follow.objects.filter(
+        **{'author' if side == 'user' else 'user': author})
+    paginator = FollowPaginator(follows, settings.FOLLOWS_IN_PAGE, side)
+    page_obj = paginator.cursor_page(
+        after=decode_id_cursor(request.GET.get('after')),
+        before=decode_id_cursor(request.GET.get('before')))
+    context = {
+        'author': author,
+        'title': title,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@condition(etag_func=follows_etag)
+def followers(request, username):
+    return follow_list(request, username, 'user', 'Подписчики')
+
+
+@condition(etag_func=follows_etag)
+def following(request, username):
+    return follow_list(request, username, 'author', 'Подписки')
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
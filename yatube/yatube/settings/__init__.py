@@ -0,0 +1,8 @@
+"""Профиль настроек выбирается переменной окружения YATUBE_ENV."""
+
+import os
+
+if os.environ.get('YATUBE_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,247 @@
+"""
+Общие настройки yatube. Профили dev и prod уточняют их, а выбирает
+профиль переменная окружения YATUBE_ENV, см. yatube/settings/__init__.py.
+
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['testserver', '127.0.0.1', 'localhost', '[::1]']
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about',
+    'sorl.thumbnail',
+]
+
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+
+MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+# Профиль prod оборачивает загрузчики в кэширующий, и тогда каждый
+# шаблон разбирается один раз за жизнь процесса
+TEMPLATE_CACHE = False
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'core.backends.InstrumentedTemplates',
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+# База выбирается окружением. SQLite подходит для разработки и одного
+# воркера; PostgreSQL нужен, когда воркеров много и пишут они параллельно
+DATABASE_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+DATABASE_ENGINE = os.environ.get('YATUBE_DB', 'sqlite')
+if DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': DATABASE_ENGINES['sqlite'],
+            'NAME': os.environ.get(
+                'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 0)),
+            # Тестовая база в файле, а не в памяти: в общей памяти SQLite
+            # параллельные записи падают с "table is locked", не дожидаясь
+            # busy_timeout
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DATABASE_ENGINES[DATABASE_ENGINE],
+            'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+            'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+            'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+            'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+            # Соединение живёт между запросами воркера, а не открывается
+            # на каждый запрос
+            'CONN_MAX_AGE': int(
+                os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+            # PgBouncer в режиме transaction не держит серверные курсоры
+            # между транзакциями, поэтому iterator() читает без них
+            'DISABLE_SERVER_SIDE_CURSORS':
+                os.environ.get('YATUBE_DB_POOLER') == 'pgbouncer',
+        }
+    }
+# Прагмы, которые core.database выставляет каждому новому соединению
+# SQLite: WAL пускает чтение параллельно записи, NORMAL не ждёт fsync
+# на каждый коммит, mmap читает файл базы без копирования, а
+# busy_timeout ждёт блокировку вместо немедленного "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+# my settings
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+POSTS_IN_PAGE = 10
+COMMENTS_IN_PAGE = 20
+FOLLOWS_IN_PAGE = 20
+# Подписки пользователя хранятся в кэше набором, если их не больше
+# лимита; кнопки подписки на страницах с авторами берут их оттуда
+FOLLOW_SET_CACHE_LIMIT = 1000
+# Нумерованные страницы (?page=) считают записи точно и кэшируют
+# результат; целую таблицу больше этого числа строк оценивают по
+# статистике планировщика
+PAGINATOR_ESTIMATE_ABOVE = 100000
+# Посты авторов с большим числом подписчиков лента подписок читает сама,
+# а не получает копией при публикации
+TIMELINE_FANOUT_LIMIT = 1000
+# Картинки постов больше лимита по байтам или пикселям отклоняются, а
+# слишком крупные уменьшаются при приёме; файл сверх лимита обработчик
+# загрузки формы поста не сохраняет
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+# Миниатюры постов и дополнение лент подписок после отписки. В боевом
+# профиле они делаются в фоновых потоках после фиксации транзакции, здесь
+# и в тестах — сразу в запросе, чтобы ничего не писалось после ответа
+BACKGROUND_ASYNC = False
+BACKGROUND_WORKERS = 2
+# Варианты картинок для srcset: ширины и форматы по убыванию
+# предпочтения; форматы, которые не умеет сохранять Pillow, пропускаются
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+# Страницы лент сбрасываются сигналами, TTL лишь подчищает кэш
+FEED_CACHE_TIMEOUT = 60 * 60
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Кэш выбирается окружением: locmem у каждого воркера свой, поэтому под
+# gunicorn нужен общий бэкенд (file, db или memcached)
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache',
+             os.path.join(BASE_DIR, 'cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+    'memcached': ('django.core.cache.backends.memcached.MemcachedCache',
+                  '127.0.0.1:11211'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.environ.get('YATUBE_CACHE', 'locmem')]
+
+CACHES = {
+    'default': {
+        # Считает попадания в кэш для PerformanceMiddleware
+        'BACKEND': 'core.backends.InstrumentedCache',
+        'WRAPPED_BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION', CACHE_LOCATION),
+    }
+}
+# Сколько секунд один воркер может пересобирать страницу ленты, пока
+# остальные отдают её предыдущую версию. Блокировка держится на
+# cache.add, который атомарен у db и memcached, но не у file
+FEED_REBUILD_LOCK_TIMEOUT = 10
+
+# PerformanceMiddleware: заголовок Server-Timing, а запросы дольше
+# PERFORMANCE_SLOW_REQUEST секунд с вероятностью SAMPLE_RATE пишутся
+# в лог yatube.performance вместе с первыми MAX_LOGGED_QUERIES SQL
+PERFORMANCE_SERVER_TIMING = True
+PERFORMANCE_SLOW_REQUEST = 0.5
+PERFORMANCE_SLOW_SAMPLE_RATE = 1.0
+PERFORMANCE_MAX_LOGGED_QUERIES = 100
+# /metrics/ открыт сотрудникам и тем, кто передал этот токен в заголовке
+# Authorization: Bearer …; пустой токен отключает доступ по нему
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+# WSGI-воркер при старте предупреждает о настройках, которые тормозят
+# под нагрузкой (core/checks.py)
+PERFORMANCE_STARTUP_CHECK = False
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
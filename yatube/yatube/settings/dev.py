@@ -0,0 +1,8 @@
+"""Разработка: отладка, шаблоны перечитываются с диска."""
+
+from .base import *  # noqa: F401,F403
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'brw6z(g(!^msyt3h!&x_&yzs0q=59$o7ht&yva$wbrc%8)m^nj'
+
+DEBUG = True
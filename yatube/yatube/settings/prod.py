@@ -0,0 +1,38 @@
+"""Боевой профиль: без отладки, с кэшами и долгими соединениями."""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import (CACHE_BACKEND, CACHE_BACKENDS, DATABASES,
+                   TEMPLATE_LOADERS, TEMPLATES)
+
+SECRET_KEY = os.environ['SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost').split(',')
+
+TEMPLATE_CACHE = True
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60))
+
+# Сессия целиком лежит в подписанной сжатой cookie: ни запроса к базе,
+# ни обращения к кэшу на каждый запрос
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+PERFORMANCE_STARTUP_CHECK = True
+
+# Поколения лент, блокировки пересборки и метки загружаемых файлов
+# хранилища по хэшу должны быть видны всем воркерам
+if CACHE_BACKEND == CACHE_BACKENDS['locmem'][0]:
+    raise ImproperlyConfigured(
+        'Для prod задайте общий кэш: YATUBE_CACHE=memcached, db или file.')
+
+BACKGROUND_ASYNC = True
@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
+from django.core.management import call_command
 from django.core.wsgi import get_wsgi_application
 
+from core.checks import warn_on_startup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Воркер разбирает шаблоны до первого запроса, а с ошибкой в шаблоне
+# не стартует вовсе
+if settings.TEMPLATE_CACHE:
+    call_command('precompile_templates', verbosity=0)
+
+if settings.PERFORMANCE_STARTUP_CHECK:
+    warn_on_startup()